@@ -0,0 +1,2 @@
+# test_output*.txt は抽出結果のサンプルで doctest ではないため収集しない
+collect_ignore_glob = ["test_output*.txt"]
@@ -1,10 +1,14 @@
+import argparse
 import json
 import os
 import math
 from pathlib import Path
 
-INPUT_JSON = r"C:\Users\ishij\OneDrive\Documents\GitHub\mqdriven\scripts\rankings_to_insert.json"
-OUTPUT_DIR = r"C:\Users\ishij\OneDrive\Documents\GitHub\mqdriven\scripts\sql_batches"
+from ranking_manifest import load_manifest
+from ranking_query import refresh_sql
+
+INPUT_JSON = Path(__file__).with_name("rankings_to_insert.json")
+OUTPUT_DIR = Path(__file__).with_name("sql_batches")
 
 BATCH_SIZE = 2000
 
@@ -15,53 +19,77 @@ def escape_sql(val):
         return "'" + val.replace("'", "''") + "'"
     return str(val)
 
-def main():
-    if not os.path.exists(OUTPUT_DIR):
-        os.makedirs(OUTPUT_DIR)
-        
-    with open(INPUT_JSON, "r", encoding="utf-8") as f:
-        records = json.load(f)
-        
-    print(f"Total records: {len(records)}")
-    
-    total_batches = math.ceil(len(records) / BATCH_SIZE)
-    
-    for i in range(total_batches):
-        batch = records[i*BATCH_SIZE : (i+1)*BATCH_SIZE]
-        
-        values_list = []
-        for r in batch:
-            # fiscal_period_id must be a valid UUID. If it's empty string, we should make it NULL (or skip?)
-            # The parsing logic put mapping logic. If key not found, it might be "".
-            # If "", we can't insert into uuid column.
-            # But earlier log said "2005-2006... UUID列は空".
-            # If UUID is empty, we set it to NULL.
-            fid = r.get("fiscal_period_id")
-            if not fid:
-                fid_val = "NULL" 
-            else:
-                fid_val = f"'{fid}'"
+def build_insert_sql(batch, table="customer_sales_rankings"):
+    values_list = []
+    for r in batch:
+        # fiscal_period_id must be a valid UUID. If it's empty string, we should make it NULL (or skip?)
+        # The parsing logic put mapping logic. If key not found, it might be "".
+        # If "", we can't insert into uuid column.
+        # But earlier log said "2005-2006... UUID列は空".
+        # If UUID is empty, we set it to NULL.
+        fid = r.get("fiscal_period_id")
+        if not fid:
+            fid_val = "NULL" 
+        else:
+            fid_val = f"'{fid}'"
 
-            # Construct row
-            # Columns match the table schema found earlier
-            val_str = f"({fid_val}, {escape_sql(r.get('rank'))}, {escape_sql(r.get('customer_name_raw'))}, {escape_sql(r.get('sales_rep_name_raw'))}, {escape_sql(r.get('department_name_raw'))}, {escape_sql(r.get('period_type'))}, {r.get('month_06',0)}, {r.get('month_07',0)}, {r.get('month_08',0)}, {r.get('month_09',0)}, {r.get('month_10',0)}, {r.get('month_11',0)}, {r.get('month_12',0)}, {r.get('month_01',0)}, {r.get('month_02',0)}, {r.get('month_03',0)}, {r.get('month_04',0)}, {r.get('month_05',0)}, {r.get('total',0)}, {escape_sql(r.get('source_file'))}, {escape_sql(r.get('doc_type'))})"
-            values_list.append(val_str)
-            
-        sql = f"""
-INSERT INTO customer_sales_ranking (
+        # Construct row
+        # Columns match the table schema found earlier
+        val_str = f"({fid_val}, {escape_sql(r.get('rank'))}, {escape_sql(r.get('customer_name_raw'))}, {escape_sql(r.get('sales_rep_name_raw'))}, {escape_sql(r.get('department_name_raw'))}, {escape_sql(r.get('period_type'))}, {r.get('month_06',0)}, {r.get('month_07',0)}, {r.get('month_08',0)}, {r.get('month_09',0)}, {r.get('month_10',0)}, {r.get('month_11',0)}, {r.get('month_12',0)}, {r.get('month_01',0)}, {r.get('month_02',0)}, {r.get('month_03',0)}, {r.get('month_04',0)}, {r.get('month_05',0)}, {r.get('total',0)}, {escape_sql(r.get('source_file'))}, {escape_sql(r.get('doc_type'))})"
+        values_list.append(val_str)
+        
+    values_sql = ",\n".join(values_list)
+    return f"""
+INSERT INTO {table} (
     fiscal_period_id, rank, customer_name_raw, sales_rep_name_raw, department_name_raw, period_type,
     month_06, month_07, month_08, month_09, month_10, month_11, month_12, 
     month_01, month_02, month_03, month_04, month_05, total,
     source_file, doc_type
 ) VALUES 
-{",\n".join(values_list)};
+{values_sql};
 """
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="挿入用JSONからINSERT文のバッチを生成する")
+    parser.add_argument("--manifest", help="ジョブマニフェスト (既定: ranking_jobs.json)")
+    parser.add_argument("--input", default=str(INPUT_JSON), help="入力JSON")
+    parser.add_argument("--output-dir", default=str(OUTPUT_DIR), help="SQL出力先")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    return parser.parse_args(argv)
+
+def write_batches(records, output_dir, table="customer_sales_rankings", batch_size=BATCH_SIZE):
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+        
+    total_batches = math.ceil(len(records) / batch_size)
+    
+    for i in range(total_batches):
+        batch = records[i*batch_size : (i+1)*batch_size]
+        sql = build_insert_sql(batch, table)
         
-        filename = os.path.join(OUTPUT_DIR, f"batch_{i+1:03d}.sql")
+        filename = os.path.join(output_dir, f"batch_{i+1:03d}.sql")
         with open(filename, "w", encoding="utf-8") as out:
             out.write(sql)
-            
-    print(f"Generated {total_batches} SQL files in {OUTPUT_DIR}")
+
+    # 集計ビュー（mv_customer_sales_ranking_*）は全バッチの適用後に一度だけ更新する
+    refresh = refresh_sql(table)
+    if refresh:
+        with open(os.path.join(output_dir, "refresh.sql"), "w", encoding="utf-8") as out:
+            out.write(refresh)
+
+    print(f"Generated {total_batches} SQL files in {output_dir}"
+          + ("（最後に refresh.sql を適用して集計ビューを更新）" if refresh else ""))
+    return total_batches
+
+def main(argv=None):
+    args = parse_args(argv)
+    table = load_manifest(args.manifest).table
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        records = json.load(f)
+        
+    print(f"Total records: {len(records)}")
+    write_batches(records, args.output_dir, table, args.batch_size)
 
 if __name__ == "__main__":
     main()
@@ -1,12 +1,16 @@
+import argparse
 import csv
 import json
 import re
 import os
 import glob
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-INPUT_DIR = r"C:\Users\ishij\Downloads\ランキング表-20260219T030449Z-1-001\ランキング表\csv出力\supabase_import"
-OUTPUT_JSON = r"C:\Users\ishij\OneDrive\Documents\GitHub\mqdriven\scripts\rankings_to_insert.json"
+from ranking_manifest import ignore_sigint, load_manifest
+
+# 入力フォルダはマニフェストの output_dir/supabase_import
+OUTPUT_JSON = Path(__file__).with_name("rankings_to_insert.json")
 
 def extract_values_from_line(line_str):
     cleaned = re.sub(r'(今期|前期)', '', line_str)
@@ -19,38 +23,41 @@ def extract_values_from_line(line_str):
             values.append(int(clean_n))
     return values
 
-def map_to_record(uuid, rank, name, rep, dept, period_type, values, doc_type, source_file):
-    # Expect 13 values: 12 months + Total.
-    # Logic from test_parse_csv_v2
-    months = [0] * 12
-    total = 0
-    
-    if len(values) == 13:
-        months = values[:12]
-        total = values[12]
+def split_values(values, months=12):
+    """
+    行の数値を (12か月分の月列, 合計) に割り当てる。月列は month_06 から期首順。
+    途中月のファイル（months < 12）は期首から months か月分と末尾の合計だけが並ぶので、
+    合計を月列に入れないよう末尾を合計として扱う。対象外の月に値が入る行は ValueError。
+    """
+    covered = max(0, min(months, 12))
+    month_values = [0] * 12
+
+    if len(values) >= 13:
+        month_values = list(values[:12])
+        total = values[-1]
     elif len(values) == 1:
         total = values[0]
-    elif len(values) > 13:
-        months = values[:12]
+    elif len(values) == covered + 1 or (values and sum(values[:-1]) == values[-1]):
+        # 月の値 + 合計（空欄の月は数値として出てこない）
+        month_values[:len(values) - 1] = values[:-1]
         total = values[-1]
-    elif len(values) > 0:
-        # Best effort fill
-        limit = min(len(values), 12)
-        for i in range(limit):
-            months[i] = values[i]
-        # If we have e.g. 12 values, maybe 'total' is missing? 
-        # Or if we have 5 values?
-        # Let's assume the provided values are Month 06..XX
-        # And Total is calculated?
-        # User instruction "12ヶ月分 + 合計 = 13個が理想"
-        # If missing, 0 pad.
-        total = sum(months) # Fallback logic?
-        # Actually user said: "values = [...] ... while len(values) < 13: append(0)"
-        # Then "total = values[12]".
-        # This implies if we have 5 values, we treat them as months 0-4, and Total is 0.
-        # But wait, usually Total is present.
-        # Let's stick to: If we extracted numbers, we trust the order.
-        pass
+    elif values:
+        # 合計列のない行: 期首から順に埋め、合計は月の和
+        month_values[:len(values)] = values
+        total = sum(values)
+    else:
+        total = 0
+
+    if any(month_values[covered:]):
+        raise ValueError(f"{covered} か月分のファイルで対象外の月に値があります: {values}")
+    return month_values, total
+
+def map_to_record(uuid, rank, name, rep, dept, period_type, values, doc_type, source_file, covered_months=12):
+    # 12か月分 + 合計 = 13個が理想。途中月のファイルは covered_months か月分 + 合計
+    try:
+        months, total = split_values(values, covered_months)
+    except ValueError as e:
+        raise ValueError(f"{source_file} 順位 {rank} {name}（{period_type}）: {e}") from None
 
     return {
         "fiscal_period_id": uuid,
@@ -76,14 +83,17 @@ def map_to_record(uuid, rank, name, rep, dept, period_type, values, doc_type, so
         "doc_type": doc_type
     }
 
-def process_file(file_path):
-    records = []
-    fname = Path(file_path).name
-    
+def iter_entries(file_path):
+    """
+    import用CSVを順位ごとのエントリ（先頭行 + 継続行）にまとめて返す。
+    """
     with open(file_path, "r", encoding="utf-8-sig") as f:
         reader = csv.reader(f)
         rows = list(reader)
-        
+    return group_entries(rows)
+
+def group_entries(rows):
+    """import用の行（1列目が fiscal_period_id）を順位ごとのエントリにまとめる"""
     current_entry = None
     
     for row in rows:
@@ -107,7 +117,7 @@ def process_file(file_path):
             
         if is_new_entry:
             if current_entry:
-                records.extend(parse_entry(current_entry, fname))
+                yield current_entry
             
             # Start new
             current_entry = {
@@ -124,11 +134,16 @@ def process_file(file_path):
                 current_entry["lines"].append(row)
                 
     if current_entry:
-        records.extend(parse_entry(current_entry, fname))
-        
+        yield current_entry
+
+def process_file(file_path, months=12):
+    records = []
+    fname = Path(file_path).name
+    for entry in iter_entries(file_path):
+        records.extend(parse_entry(entry, fname, months))
     return records
 
-def parse_entry(entry, source_file):
+def parse_entry(entry, source_file, months=12):
     # Flatten text from lines
     # Split by newline logic
     
@@ -176,11 +191,11 @@ def parse_entry(entry, source_file):
     
     res = []
     
-    # Current
+    # Current（途中月のファイルで月数が足りないのは今期だけ。前期は12か月分そろう）
     if vals_a:
         res.append(map_to_record(
             entry["uuid"], entry["rank"], entry["name"], entry["rep"], entry["dept"],
-            "今期", vals_a, entry.get("doc_type_raw", ""), source_file
+            "今期", vals_a, entry.get("doc_type_raw", ""), source_file, months
         ))
         
     # Previous
@@ -198,22 +213,66 @@ def parse_entry(entry, source_file):
         
     return res
 
-def main():
-    all_files = glob.glob(os.path.join(INPUT_DIR, "*_import.csv"))
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="supabase_import のCSVを挿入用JSONに変換する")
+    parser.add_argument("--manifest", help="ジョブマニフェスト (既定: ranking_jobs.json)")
+    parser.add_argument("--input-dir", help="入力CSVフォルダ (既定: <output_dir>/supabase_import)")
+    parser.add_argument("--output", default=str(OUTPUT_JSON), help="出力JSON")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="並列プロセス数")
+    return parser.parse_args(argv)
+
+def parse_files(input_dir, workers=None):
+    """input_dir 内の *_import.csv をすべてレコードに変換する（ファイル名順）"""
+    all_files = sorted(glob.glob(os.path.join(input_dir, "*_import.csv")))
     all_records = []
     
     print(f"Processing {len(all_files)} files...")
-    for f in all_files:
-        print(f"  {Path(f).name}")
-        recs = process_file(f)
-        all_records.extend(recs)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(all_files) or 1))
+    with ProcessPoolExecutor(max_workers=workers, initializer=ignore_sigint) as pool:
+        try:
+            # map は入力順で結果を返すため、出力順は並列度に依存しない
+            for f, recs in zip(all_files, pool.map(process_file, all_files)):
+                print(f"  {Path(f).name}")
+                all_records.extend(recs)
+        except KeyboardInterrupt:
+            # 未着手のファイルは処理せずに止める
+            pool.shutdown(cancel_futures=True)
+            raise
         
     print(f"Total extracted records: {len(all_records)}")
-    
-    with open(OUTPUT_JSON, "w", encoding="utf-8") as f:
-        json.dump(all_records, f, ensure_ascii=False, indent=2)
-        
-    print(f"Saved to {OUTPUT_JSON}")
+    return all_records
+
+def build_parse_manifest(records):
+    """
+    パース結果の件数表。ロード時の件数照合に使う。
+    {"records": 総件数, "periods": {fiscal_period_id: {"rows": n, "period_types": {...}, "sources": {...}}}}
+    """
+    periods = {}
+    for r in records:
+        p = periods.setdefault(r.get("fiscal_period_id") or "", {"rows": 0, "period_types": {}, "sources": {}})
+        p["rows"] += 1
+        pt = r.get("period_type") or ""
+        p["period_types"][pt] = p["period_types"].get(pt, 0) + 1
+        src = r.get("source_file") or ""
+        p["sources"][src] = p["sources"].get(src, 0) + 1
+    return {"records": len(records), "periods": periods}
+
+def parse_manifest_path(records_path):
+    return Path(records_path).with_suffix(".manifest.json")
+
+def write_records(path, records):
+    """レコードJSONと、件数照合用のパースマニフェストを書き出す"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+    with open(parse_manifest_path(path), "w", encoding="utf-8") as f:
+        json.dump(build_parse_manifest(records), f, ensure_ascii=False, indent=2)
+    print(f"Saved to {path}")
+
+def main(argv=None):
+    args = parse_args(argv)
+    input_dir = args.input_dir or load_manifest(args.manifest).import_dir
+    all_records = parse_files(input_dir, args.jobs)
+    write_records(args.output, all_records)
 
 if __name__ == "__main__":
     main()
@@ -1,96 +1,131 @@
-import pdfplumber
+import argparse
+import codecs
 import csv
-import re
 import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from itertools import zip_longest
 from pathlib import Path
 
+from ranking_manifest import discover_jobs, load_manifest, load_state, plan_jobs, save_state, update_state
+
 # =============================
 # 設定
 # =============================
-# ユーザー環境のパス（そのまま維持）
-OUTPUT_DIR = r"C:\Users\ishij\Downloads\ランキング表-20260219T030449Z-1-001\ランキング表\csv出力"
-
-# 各期の「最終版のみ」を使用（途中月のファイルは除外）
+# 入力PDF・ラベル・fiscal_period_id は ranking_jobs.json（マニフェスト）で管理する。
+# 各期の「最終版のみ」を使用（途中月のファイルは発見モードでは除外）
 # ※ 同じ期で複数ある場合、最も期間が長いもの（通期）だけ残す
-PDF_FILES = {
-    # 期名: ファイルパス
-    "第75期": r"C:\Users\ishij\Downloads\ランキング表-20260219T030449Z-1-001\ランキング表\第75期　2015.06-05　お客様ランキング表.pdf",
-    "第76期": r"C:\Users\ishij\Downloads\ランキング表-20260219T030449Z-1-001\ランキング表\第76期　2016.06-05　お客様ランキング表02 (1).pdf",
-    "第77期": r"C:\Users\ishij\Downloads\ランキング表-20260219T030449Z-1-001\ランキング表\第77期　2017.06-05　お客様ランキング表_順位.pdf",
-    "第78期": r"C:\Users\ishij\Downloads\ランキング表-20260219T030449Z-1-001\ランキング表\第78期 2018.06-05 お客様ランキング表_順位別.pdf",
-    "第79期": r"C:\Users\ishij\Downloads\ランキング表-20260219T030449Z-1-001\ランキング表\第79期 2020.06-05 お客様ランキング表_最終_順位別.pdf",
-    "第80期": r"C:\Users\ishij\Downloads\ランキング表-20260219T030449Z-1-001\ランキング表\第80期 2020.06-05 お客様ランキング表_順位別 .pdf",
-    "第81期_順位": r"C:\Users\ishij\Downloads\ランキング表-20260219T030449Z-1-001\ランキング表\第81期 2021.06-05 お客様ランキング表(順位).pdf",
-    "第81期_担当": r"C:\Users\ishij\Downloads\ランキング表-20260219T030449Z-1-001\ランキング表\第81期ランキング表(担当別).pdf",
-    "第82期_順位": r"C:\Users\ishij\Downloads\ランキング表-20260219T030449Z-1-001\ランキング表\第82期 2022.06-2023.05 お客様ランキング表_順位別.pdf", 
-    "第82期_担当": r"C:\Users\ishij\Downloads\ランキング表-20260219T030449Z-1-001\ランキング表\第82期 2022.06-12 ランキング表(担当別).pdf",
-    "第83期_順位": r"C:\Users\ishij\Downloads\ランキング表-20260219T030449Z-1-001\ランキング表\第83期 2023.06-2024.05 お客様ランキング表.pdf",
-    "第83期_担当": r"C:\Users\ishij\Downloads\ランキング表-20260219T030449Z-1-001\ランキング表\第83期 2023.06-2024.05担当別ランキング表.pdf",
-    "第84期_順位": r"C:\Users\ishij\Downloads\ランキング表-20260219T030449Z-1-001\ランキング表\第84期 2024.06-2025.05 お客様ランキング表.pdf",
-    "第84期_担当": r"C:\Users\ishij\Downloads\ランキング表-20260219T030449Z-1-001\ランキング表\第84期 2024.06-2025.05 担当別ランキング表.pdf",
-    "2005-2006": r"C:\Users\ishij\Downloads\ランキング表-20260219T030449Z-1-001\ランキング表\20051001～ 20060930　売上順位表（上位300社).pdf",
-    "2006-2007": r"C:\Users\ishij\Downloads\ランキング表-20260219T030449Z-1-001\ランキング表\20061001～ 20070930　売上順位表（500社）.pdf",
-}
-
-# Supabase fiscal_periodsテーブルのIDマップ
-# SELECT period_name, id FROM fiscal_periods ORDER BY start_date; の結果に基づく
-PERIOD_ID_MAP = {
-    # 第75期 (2015-06-01 ~ 2016-05-31)
-    "第75期": "85f5223a-1d17-406d-94c6-e10708faa472",
-    # 第76期 (2016-06-01 ~ 2017-05-31)
-    "第76期": "e144e2ff-25b1-46da-a368-7df8959aaa4e",
-    # 第77期 (2017-06-01 ~ 2018-05-31)
-    "第77期": "a9c906b2-de3b-437e-ae10-dcbf7007b9a9",
-    # 第78期 (2018-06-01 ~ 2019-05-31)
-    "第78期": "5e6c15e5-0f32-436a-aadb-8bb67b403f67",
-    # 第79期 (2019-06-01 ~ 2020-05-31)
-    "第79期": "70fe82b2-9638-4c66-acb3-56a063128099",
-    # 第80期 (2020-06-01 ~ 2021-05-31)
-    "第80期": "23ac2561-e779-4394-aa14-23bcfd421b06",
-    
-    # 第81期 (2021-06-01 ~ 2022-05-31)
-    "第81期_順位": "0bfc3c17-787f-4da4-b5f7-305850bb12c0",
-    "第81期_担当": "0bfc3c17-787f-4da4-b5f7-305850bb12c0",
-    
-    # 第82期 (2022-06-01 ~ 2023-05-31)
-    "第82期_順位": "514abe0a-2e7e-40ba-86b8-d5225484d5f3",
-    "第82期_担当": "514abe0a-2e7e-40ba-86b8-d5225484d5f3",
-    
-    # 第83期 (2023-06-01 ~ 2024-05-31)
-    "第83期_順位": "c588c222-2584-4d31-bffd-615a4bea7b2c",
-    "第83期_担当": "c588c222-2584-4d31-bffd-615a4bea7b2c",
-    
-    # 第84期 (2024-06-01 ~ 2025-05-31)
-    "第84期_順位": "ea6a6e35-2c65-4ca0-8dfc-4196959a2984",
-    "第84期_担当": "ea6a6e35-2c65-4ca0-8dfc-4196959a2984",
-
-    # 注意: 2005-2006, 2006-2007はDBに存在しないため、UUIDは割り当てられません。
-}
-
+# 期中の数字は ranking_snapshot.py（rankings.py snapshot）で途中月のファイルから差分で取り込む
 
 # =============================
 # PDF → 行データ抽出
 # =============================
-def extract_rows(pdf_path):
-    rows = []
+def extract_rows(pdf_path, ocr=None, confidence=None):
+    """
+    PDF全ページの行データ。
+    ocr（ranking_ocr.OcrConfig）を渡すと、画像のみのページ（スキャン）を OCR して同じ行の形にする。
+    confidence を渡すと二段階抽出（ranking_adaptive）になり、高速パスの信頼度が
+    それ未満のページだけ表検出を行う。None なら全ページで表検出を行う。
+    """
+    # pdfplumber（pdfminer / Pillow）は読み込みが重いため、抽出時にだけ import する
+    from ranking_adaptive import TIER_SCANNED, PageExtractor
+    from ranking_ocr import ocr_pages, page_hash
+
+    name = Path(pdf_path).name
+    page_rows = []
+    scanned = {}
+    skipped = 0
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                tables = page.extract_tables()
-                if tables:
-                    for table in tables:
-                        for row in table:
-                            if row and any(cell for cell in row if cell):
-                                rows.append([str(c).strip() if c else "" for c in row])
-                else:
-                    text = page.extract_text()
-                    if text:
-                        for line in text.splitlines():
-                            line = line.strip()
-                            if line:
-                                rows.append([line])
+        with PageExtractor(pdf_path, confidence) as extractor:
+            for i in range(extractor.page_count):
+                rows, tier = extractor.extract(i)
+                if tier == TIER_SCANNED and ocr is not None:
+                    scanned[i] = page_hash(extractor.plumber_page(i), ocr)
+                elif not rows:
+                    skipped += 1
+                page_rows.append(rows)
+            if confidence is not None:
+                print(f"  ⚡ {name}: {extractor.summary()}")
+        if scanned:
+            # OCR はページ単位でプロセスプールに分散し、結果はページ内容のハッシュでキャッシュする
+            for i, text in ocr_pages(pdf_path, scanned, ocr).items():
+                page_rows[i] = text_to_rows(text)
     except Exception as e:
-        print(f"  ⚠️  {Path(pdf_path).name}: {e}")
+        print(f"  ⚠️  {name}: {e}")
+
+    if ocr is None and skipped:
+        print(f"  ⚠️  {name}: テキストのないページ {skipped} 件をスキップしました（スキャンPDFは --ocr で取り込めます）")
+    return [row for page in page_rows for row in page]
+
+def extract_page_rows(page, table_settings=None):
+    """1ページ分の行データ（表があれば表、なければテキスト行）"""
+    rows = []
+    tables = page.extract_tables(table_settings)
+    if tables:
+        for table in tables:
+            for row in table:
+                if row and any(cell for cell in row if cell):
+                    rows.append([str(c).strip() if c else "" for c in row])
+    else:
+        # 文字情報のあるページは表検出（ranking_adaptive の text_table を含む）に任せ、
+        # 行の文法で列に分けるのは OCR のテキストだけにする
+        text = page.extract_text()
+        if text:
+            rows.extend([line.strip()] for line in text.splitlines() if line.strip())
+    return rows
+
+# =============================
+# テキスト行 → 表の行
+# =============================
+# OCR したページも、表と同じ列構成
+# [順位, 得意先名, 担当, 部門, 区分, 06月 … 05月, 合計] にそろえる。
+# 今期・前期の2段は、表のセルと同じく「今期の値\n前期の値」にまとめる。
+NUMBER_RE = re.compile(r"^-?[\d,]+$")
+PERIOD_TYPES = ("今期", "前期")
+VALUE_START = 5
+
+def split_text_line(line):
+    """
+    1行を列に分ける。順位で始まる行は先頭行、数値だけの行（前期など）は2段目として
+    順位・名前を空にして返す。どちらでもなければ None。
+    先頭行は区分（今期・前期）か、月の値と合計の2つ以上の数値を持つものに限る
+    （「1 ページ 3」のようなページ番号の行を順位として拾わない）。
+    """
+    tokens = line.split()
+    values = []
+    while tokens and NUMBER_RE.match(tokens[-1]):
+        values.insert(0, tokens.pop())
+    if not values:
+        return None
+    period_types = [t for t in tokens if t in PERIOD_TYPES]
+    tokens = [t for t in tokens if t not in PERIOD_TYPES]
+    if not tokens:
+        return ["", "", "", "", "\n".join(period_types)] + values
+    if len(tokens) >= 2 and tokens[0].replace(",", "").isdigit() and (period_types or len(values) >= 2):
+        rank, name, *rest = tokens
+        rep = rest[0] if rest else ""
+        dept = " ".join(rest[1:])
+        return [rank, name, rep, dept, "\n".join(period_types)] + values
+    return None
+
+def text_to_rows(text):
+    rows = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        row = split_text_line(line)
+        prev = rows[-1] if rows else None
+        if row and row[0]:
+            rows.append(row)
+        elif row and prev and prev[0] and len(prev) > VALUE_START and "\n" not in prev[VALUE_START]:
+            # 2段目: 直前の行の各セルに改行でつなぐ
+            kinds = "\n".join(k for k in (prev[4], row[4]) if k)
+            values = [f"{a}\n{b}" for a, b in zip_longest(prev[VALUE_START:], row[VALUE_START:], fillvalue="")]
+            rows[-1] = prev[:4] + [kinds] + values
+        else:
+            rows.append([line])
     return rows
 
 # =============================
@@ -106,53 +141,61 @@ def deduplicate_rows(rows):
             result.append(row)
     return result
 
+# =============================
+# Supabaseインポート用の行
+# =============================
+HEADER_KEYWORDS = ["順位", "No", "Rank", "得意先名", "氏名", "担当"]
+
+def is_header_row(row):
+    # もし1行目に「順位」「No」「Rank」などの言葉が含まれていればヘッダーとみなす
+    return any(keyword in str(cell) for cell in row for keyword in HEADER_KEYWORDS)
+
+def to_import_rows(rows, period_id=None):
+    """1列目に fiscal_period_id を付けた行（先頭がヘッダーなら識別子を入れる）"""
+    import_ready_rows = []
+    is_header = bool(rows) and is_header_row(rows[0])
+    for i, row in enumerate(rows):
+        if i == 0 and is_header:
+            # ヘッダー行には識別子を入れる
+            new_row = ["fiscal_period_id"] + row
+        else:
+            # データ行にはUUIDを入れる（なければ空文字）
+            new_row = [period_id if period_id else ""] + row
+        import_ready_rows.append(new_row)
+    return import_ready_rows
+
 # =============================
 # 1ファイル処理
 # =============================
-def process_one(label, pdf_path, output_dir):
+def process_one(label, pdf_path, output_dir, period_id=None, ocr=None, confidence=None):
     pdf_path = Path(pdf_path)
     if not pdf_path.exists():
         print(f"  ❌ 見つかりません: {pdf_path.name}")
         return []
 
     print(f"  📄 [{label}] {pdf_path.name}")
-    rows = extract_rows(str(pdf_path))
+    rows = extract_rows(str(pdf_path), ocr, confidence)
     rows = deduplicate_rows(rows)
     
     # ----------------------------------------------------
     # UUIDの付与 (Supabaseインポート用)
     # ----------------------------------------------------
-    period_id = PERIOD_ID_MAP.get(label)
+    # period_id はマニフェストの fiscal_periods から渡される
     
     # Supabaseインポート用のクリーンなデータを作成
     # 1列目にfiscal_period_idを追加
-    import_ready_rows = []
-    
-    if rows:
-        # ヘッダー行の判定（簡易的）
-        # もし1行目に「順位」「No」「Rank」などの言葉が含まれていればヘッダーとみなす
-        header_keywords = ["順位", "No", "Rank", "得意先名", "氏名", "担当"]
-        first_row = rows[0]
-        is_header = any(keyword in str(cell) for cell in first_row for keyword in header_keywords)
-        
-        for i, row in enumerate(rows):
-            if i == 0 and is_header:
-                # ヘッダー行には識別子を入れる
-                new_row = ["fiscal_period_id"] + row
-            else:
-                # データ行にはUUIDを入れる（なければ空文字）
-                new_row = [period_id if period_id else ""] + row
-            import_ready_rows.append(new_row)
-    else:
-        import_ready_rows = []
+    import_ready_rows = to_import_rows(rows, period_id)
 
     # 1. 元のリクエスト通りのCSV出力 (メタデータ付き)
-    out_path = Path(output_dir) / f"{label}.csv"
-    with open(out_path, "w", newline="", encoding="utf-8-sig") as f:
+    # 統合CSVのシャードを兼ねるため、書き終えてから置き換える
+    out_path = shard_path(label, output_dir)
+    tmp_path = out_path.with_name(out_path.name + ".tmp")
+    with open(tmp_path, "w", newline="", encoding="utf-8-sig") as f:
         writer = csv.writer(f)
         writer.writerow(["# 期・区分", label, "元ファイル", pdf_path.name, "FiscalPeriodID", period_id])
         writer.writerow([])
         writer.writerows(rows)
+    os.replace(tmp_path, out_path)
 
     # 2. Supabaseインポート用CSV出力 (クリーン、UUID付き)
     # カラム名が一致しないとインポートできない可能性があるため、ヘッダーも重要
@@ -174,32 +217,215 @@ def process_one(label, pdf_path, output_dir):
 # =============================
 # 統合CSV作成
 # =============================
-def create_combined(all_data, output_dir):
-    out_path = Path(output_dir) / "【統合・重複除去済み】全期間ランキング.csv"
-    with open(out_path, "w", newline="", encoding="utf-8-sig") as f:
-        writer = csv.writer(f)
-        writer.writerow(["期・区分", "内容"])
-        for label, rows in all_data.items():
-            writer.writerow([])
-            writer.writerow([f"=== {label} ==="])
-            writer.writerows(rows)
-    print(f"\n📊 統合CSV: {out_path.name}")
+COMBINED_FILENAME = "【統合・重複除去済み】全期間ランキング.csv"
+COMBINED_INDEX = ".combined_index.json"
+SHARD_META_ROWS = 2  # 各期CSVの先頭（メタデータ行 + 空行）
+
+def shard_path(label, output_dir):
+    """各期のCSV。統合CSVはこれを並べて作る"""
+    return Path(output_dir) / f"{label}.csv"
+
+def _file_stat(path):
+    st = Path(path).stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+class _Utf8Writer:
+    """バイナリファイルに csv.writer で書くためのラッパー（位置は out.tell() で取れる）"""
+    def __init__(self, out):
+        self.out = out
+
+    def write(self, s):
+        return self.out.write(s.encode("utf-8"))
+
+def _write_section(text, label, path):
+    """シャードを1行ずつ読み、区切り行に続けて書き出す（データ行がなければ何も書かない）"""
+    writer = csv.writer(text)
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        for _ in range(SHARD_META_ROWS):
+            next(reader, None)
+        started = False
+        for row in reader:
+            if not started:
+                writer.writerow([])
+                writer.writerow([f"=== {label} ==="])
+                started = True
+            writer.writerow(row)
+
+def _copy_range(src, dst, offset, length, chunk_size=1 << 20):
+    src.seek(offset)
+    while length > 0:
+        chunk = src.read(min(chunk_size, length))
+        if not chunk:
+            raise EOFError("統合CSVが索引より短くなっています")
+        dst.write(chunk)
+        length -= len(chunk)
+
+def load_combined_index(output_dir):
+    """
+    前回の統合CSVの索引（シャードごとのサイズ・更新時刻と、統合CSV内の位置）。
+    統合CSV自体が索引作成後に変わっていれば使わない。
+    """
+    out_path = Path(output_dir) / COMBINED_FILENAME
+    index = load_state(Path(output_dir) / COMBINED_INDEX)
+    if not index or not out_path.exists() or index.get("combined") != _file_stat(out_path):
+        return []
+    return index.get("shards", [])
+
+def create_combined(labels, output_dir):
+    """
+    各期のCSV（シャード）を labels の順に連結して統合CSVを作る。
+
+    - 順序は labels（ジョブの並び順）だけで決まり、抽出の完了順や並列度には依存しない
+    - シャードは1行ずつストリーミングで読むため、メモリは行単位で済む
+    - 前回から変わっていないシャードは、前回の統合CSVから該当区間をそのままコピーする
+    - 一時ファイルに書いてから置き換えるため、途中で止まっても前回の統合CSVが残る
+    """
+    output_dir = Path(output_dir)
+    out_path = output_dir / COMBINED_FILENAME
+    previous = {s["label"]: s for s in load_combined_index(output_dir)}
+
+    shards = []
+    for label in labels:
+        path = shard_path(label, output_dir)
+        if path.exists():
+            shards.append((label, path, _file_stat(path)))
+
+    unchanged = [
+        label for label, _, stat in shards
+        if label in previous and all(previous[label][k] == stat[k] for k in stat)
+    ]
+    if [s["label"] for s in previous.values()] == [label for label, _, _ in shards] == unchanged:
+        print(f"\n📊 統合CSV: {out_path.name}（変更なし）")
+        return out_path
+
+    tmp_path = out_path.with_name(out_path.name + ".tmp")
+    entries = []
+    old = open(out_path, "rb") if unchanged else None
+    try:
+        with open(tmp_path, "wb") as out:
+            text = _Utf8Writer(out)
+            out.write(codecs.BOM_UTF8)
+            csv.writer(text).writerow(["期・区分", "内容"])
+            for label, path, stat in shards:
+                offset = out.tell()
+                if label in unchanged:
+                    _copy_range(old, out, previous[label]["offset"], previous[label]["length"])
+                else:
+                    _write_section(text, label, path)
+                entries.append({"label": label, **stat, "offset": offset, "length": out.tell() - offset})
+    finally:
+        if old:
+            old.close()
+    os.replace(tmp_path, out_path)
+    save_state(output_dir / COMBINED_INDEX, {"combined": _file_stat(out_path), "shards": entries})
+
+    rebuilt = len(shards) - len(unchanged)
+    print(f"\n📊 統合CSV: {out_path.name}（{len(shards)} 件中 {rebuilt} 件を再構築）")
+    return out_path
 
 # =============================
-# メイン
+# ジョブ実行（並列）
 # =============================
-def main():
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    print(f"📁 出力先: {OUTPUT_DIR}")
-    print(f"✅ 処理対象: {len(PDF_FILES)} 件\n{'='*50}\n")
+def run_job(job, output_dir, ocr=None, confidence=None):
+    # 行データは各期のCSVに書き出し済み。プロセス間では件数だけ返す
+    return len(process_one(job.label, job.source, output_dir, job.fiscal_period_id, ocr, confidence))
 
-    all_data = {}
-    for label, path in PDF_FILES.items():
-        rows = process_one(label, path, OUTPUT_DIR)
-        if rows:
-            all_data[label] = rows
 
-    create_combined(all_data, OUTPUT_DIR)
+def select_jobs(manifest, discover=None, include_partial=False):
+    """マニフェストのジョブ、または発見モードで見つけたジョブを返す"""
+    if discover is None:
+        return manifest.jobs
+    folder = Path(discover) if discover else manifest.source_dir
+    jobs = discover_jobs(folder, manifest, include_partial=include_partial)
+    print(f"🔍 発見モード: {folder} から {len(jobs)} 件")
+    return jobs
+
+
+def extract_jobs(manifest, jobs, workers=None, force=False, ocr=None, confidence=None):
+    """
+    新規・変更のあったジョブだけを並列に抽出し、統合CSVを作り直す。
+    戻り値: 今回抽出したジョブのラベル一覧
+    """
+    output_dir = manifest.output_dir
+    os.makedirs(output_dir, exist_ok=True)
+    state = load_state(manifest.state_path)
+    planned, fingerprints = plan_jobs(jobs, state, output_dir, force=force)
+
+    print(f"📁 出力先: {output_dir}")
+    print(f"✅ 処理対象: {len(planned)} / {len(jobs)} 件（未変更はスキップ）\n{'='*50}\n")
+
+    results = {}
+    if planned:
+        workers = max(1, min(workers or os.cpu_count() or 1, len(planned)))
+        if ocr is not None and ocr.workers is None:
+            # 各抽出ワーカーが OCR プールを持つので、CPU 数を抽出ワーカー数で分け合う
+            ocr = replace(ocr, workers=max(1, (os.cpu_count() or 1) // workers))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {job.label: pool.submit(run_job, job, output_dir, ocr, confidence)
+                       for job in planned}
+            for label, future in futures.items():
+                results[label] = future.result()
+
+    update_state(manifest.state_path, {label: fingerprints[label] for label, count in results.items() if count})
+    create_combined([job.label for job in jobs], output_dir)
+    return [label for label, count in results.items() if count]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="ランキング表PDFをCSVに変換する")
+    parser.add_argument("--manifest", help="ジョブマニフェスト (既定: ranking_jobs.json)")
+    parser.add_argument("--source-dir", help="入力PDFフォルダ（マニフェストの値を上書き）")
+    parser.add_argument("--output-dir", help="CSV出力先（マニフェストの値を上書き）")
+    parser.add_argument("--discover", nargs="?", const="", metavar="DIR",
+                        help="フォルダを走査してファイル名から期・レイアウトを推定する")
+    parser.add_argument("--include-partial", action="store_true",
+                        help="発見モードで途中月のファイルも対象にする")
+    parser.add_argument("--force", action="store_true", help="変更がなくても全件処理する")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="並列プロセス数")
+    add_extraction_arguments(parser)
+    return parser.parse_args(argv)
+
+def add_extraction_arguments(parser):
+    from ranking_adaptive import DEFAULT_CONFIDENCE
+
+    parser.add_argument("--full-tables", action="store_true",
+                        help="全ページで表検出を行う（二段階抽出の高速パスを使わない）")
+    parser.add_argument("--confidence", type=float, default=DEFAULT_CONFIDENCE,
+                        help=f"高速パスの結果を採用する信頼度の下限 (既定: {DEFAULT_CONFIDENCE})")
+    parser.add_argument("--ocr", action="store_true",
+                        help="画像のみのページを OCR する（既存の出力を作り直すには --force も指定）")
+    parser.add_argument("--ocr-dpi", type=int, default=None, help="OCR 用に描画する解像度 (既定: 300)")
+    parser.add_argument("--ocr-lang", default=None, help="tesseract の言語 (既定: jpn)")
+    parser.add_argument("--ocr-workers", type=int, default=None, help="OCR の並列プロセス数")
+
+def extraction_confidence(args):
+    """二段階抽出のしきい値（--full-tables 指定時は None = 全ページで表検出）"""
+    return None if args.full_tables else args.confidence
+
+def ocr_config(args, output_dir):
+    """--ocr 指定時の OCR 設定（キャッシュは出力先の .ocr_cache）"""
+    if not args.ocr:
+        return None
+    from ranking_ocr import CACHE_DIRNAME, DEFAULT_DPI, DEFAULT_LANG, OcrConfig
+
+    return OcrConfig(
+        dpi=args.ocr_dpi or DEFAULT_DPI,
+        lang=args.ocr_lang or DEFAULT_LANG,
+        workers=args.ocr_workers,
+        cache_dir=Path(output_dir) / CACHE_DIRNAME,
+    )
+
+
+# =============================
+# メイン
+# =============================
+def main(argv=None):
+    args = parse_args(argv)
+    manifest = load_manifest(args.manifest, args.source_dir, args.output_dir)
+    jobs = select_jobs(manifest, args.discover, args.include_partial)
+    extract_jobs(manifest, jobs, args.jobs, args.force,
+                 ocr_config(args, manifest.output_dir), extraction_confidence(args))
     print(f"\n{'='*50}")
     print(f"✅ 完了！")
     print(f"ℹ️  Supabaseへのインポートには 'csv出力/supabase_import' フォルダ内のCSVを使用してください。")
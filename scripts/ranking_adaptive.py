@@ -0,0 +1,331 @@
+"""
+二段階（適応型）のページ抽出
+
+extract_tables はページごとに pdfminer で文字・図形を解析してから表を検出するため、
+1ページ数百msかかる。多くのページは罫線で区切られた素直な表なので、
+
+1. 高速パス: pypdfium2（pdfplumber の依存として導入済み）で文字と罫線だけを読み、
+   罫線の格子からセルを組み立てる（pdfminer を通さないため1ページ数ms〜数十ms）
+2. 信頼度を採点し、しきい値未満のページだけ pdfplumber の extract_tables に回す
+   （既定の設定で足りなければ文字位置ベースの設定も試し、表の形を保ったまま
+   信頼度が上がる場合だけそちらを使う）
+
+信頼度 = 順位で始まるエントリのうち、次をすべて満たすものの割合
+- 各段（今期・前期）の数値がちょうど13個（12か月 + 合計）
+- 各段の12か月の和が合計と一致する
+- 順位がページ内で単調増加（1 に戻るのはグループの切り替わりとみなす）
+
+エントリがない・罫線がないページは高速パスでは判断できないため、常に表検出に回す。
+"""
+import ctypes
+from bisect import bisect_right
+from collections import Counter
+
+from process_rankings import NUMBER_RE, extract_page_rows
+
+DEFAULT_CONFIDENCE = 1.0
+VALUE_COUNT = 13
+
+# 表検出の2段目: 罫線がずれている・欠けているページ向けに文字の並びから列を推定する
+TEXT_TABLE_SETTINGS = {"vertical_strategy": "text", "horizontal_strategy": "text"}
+
+# pdfplumber の既定値に合わせる（セル内の語・行の区切り）
+X_TOLERANCE = 3
+Y_TOLERANCE = 3
+# 罫線とみなす線分
+LINE_TOLERANCE = 1.0
+MIN_LINE_LENGTH = 5.0
+SNAP_TOLERANCE = 2.0
+
+TIER_FAST = "fast"
+TIER_TABLE = "table"
+TIER_TEXT_TABLE = "text_table"
+TIER_SCANNED = "scanned"
+
+
+# =============================
+# 信頼度
+# =============================
+def _row_values(row):
+    """末尾の数値セルを段ごとに分ける（セル内の改行 = 今期/前期）。数値でないセルで止まる"""
+    cells = []
+    for cell in reversed(row):
+        parts = cell.split("\n") if cell else []
+        if not parts or not all(NUMBER_RE.match(p) for p in parts):
+            break
+        cells.insert(0, parts)
+    if not cells:
+        return []
+    depth = len(cells[0])
+    if any(len(parts) != depth for parts in cells):
+        return None
+    return [[int(parts[i].replace(",", "")) for parts in cells] for i in range(depth)]
+
+
+def _entry_ok(row):
+    lines = _row_values(row)
+    if not lines:
+        return False
+    return all(len(values) == VALUE_COUNT and sum(values[:-1]) == values[-1] for values in lines)
+
+
+def score_rows(rows):
+    """
+    戻り値: (信頼度, エントリ数)。エントリがなければ信頼度は None。
+    """
+    entries = passed = 0
+    last_rank = None
+    for row in rows:
+        rank = row[0].replace(",", "") if row else ""
+        if not rank.isdigit():
+            continue
+        rank = int(rank)
+        entries += 1
+        monotonic = last_rank is None or rank >= last_rank or rank == 1
+        last_rank = rank
+        passed += monotonic and _entry_ok(row)
+    return (passed / entries if entries else None), entries
+
+
+def _columns(rows):
+    """列数の最頻値"""
+    widths = Counter(len(r) for r in rows)
+    return widths.most_common(1)[0][0] if widths else 0
+
+
+# =============================
+# 高速パス（pypdfium2）
+# =============================
+def _cluster(values, tolerance=SNAP_TOLERANCE):
+    """近い座標をまとめ、それぞれの平均を返す（昇順）"""
+    groups = []
+    for v in sorted(values):
+        if groups and v - groups[-1][-1] <= tolerance:
+            groups[-1].append(v)
+        else:
+            groups.append([v])
+    return [sum(g) / len(g) for g in groups]
+
+
+def ruling_lines(page):
+    """
+    ページ上の水平・垂直の線分（矩形の辺も含む）から、列の境界 x と行の境界 y を返す。
+    """
+    import pypdfium2.raw as pdfium_c
+
+    xs, ys = [], []
+    x, y = ctypes.c_float(), ctypes.c_float()
+    for obj in page.get_objects(filter=[pdfium_c.FPDF_PAGEOBJ_PATH]):
+        a, b, c, d, e, f = obj.get_matrix().get()
+        start = prev = None
+        for k in range(pdfium_c.FPDFPath_CountSegments(obj.raw)):
+            segment = pdfium_c.FPDFPath_GetPathSegment(obj.raw, k)
+            pdfium_c.FPDFPathSegment_GetPoint(segment, x, y)
+            point = (a * x.value + c * y.value + e, b * x.value + d * y.value + f)
+            kind = pdfium_c.FPDFPathSegment_GetType(segment)
+            edges = []
+            if kind == pdfium_c.FPDF_SEGMENT_MOVETO:
+                start = point
+            elif prev is not None:
+                edges.append((prev, point))
+            if pdfium_c.FPDFPathSegment_GetClose(segment) and start is not None:
+                edges.append((point, start))
+            for (x0, y0), (x1, y1) in edges:
+                if abs(y1 - y0) <= LINE_TOLERANCE and abs(x1 - x0) >= MIN_LINE_LENGTH:
+                    ys.append((y0 + y1) / 2)
+                elif abs(x1 - x0) <= LINE_TOLERANCE and abs(y1 - y0) >= MIN_LINE_LENGTH:
+                    xs.append((x0 + x1) / 2)
+            prev = point
+    return _cluster(xs), _cluster(ys)
+
+
+def page_chars(textpage):
+    """(文字, left, bottom, right, top) の一覧。pdfium が補った空白・改行は除く"""
+    import pypdfium2.raw as pdfium_c
+
+    raw = textpage.raw
+    count = textpage.count_chars()
+    text = textpage.get_text_range(0, count)
+    if len(text) != count:
+        # サロゲートペアなどで文字数が合わない場合は1文字ずつ取り出す
+        text = "".join(chr(pdfium_c.FPDFText_GetUnicode(raw, i)) for i in range(count))
+    rect = pdfium_c.FS_RECTF()
+    chars = []
+    for i, ch in enumerate(text):
+        if ch in "\r\n" or "\ud800" <= ch <= "\udfff":
+            continue
+        # pdfium が補う文字は空白・改行だけなので、空白のときだけ確かめる
+        if ch.isspace() and pdfium_c.FPDFText_IsGenerated(raw, i) == 1:
+            continue
+        # フォント基準の文字枠（pdfplumber の top/bottom に相当）
+        pdfium_c.FPDFText_GetLooseCharBox(raw, i, rect)
+        chars.append((ch, rect.left, rect.bottom, rect.right, rect.top))
+    return chars
+
+
+def _cell_text(chars):
+    """セル内の文字を pdfplumber と同じく「語は空白、行は改行」で連結する"""
+    lines = []
+    for ch in sorted(chars, key=lambda c: -c[4]):
+        if lines and lines[-1][0] - ch[4] <= Y_TOLERANCE:
+            lines[-1][1].append(ch)
+        else:
+            lines.append([ch[4], [ch]])
+    out = []
+    for _, line in lines:
+        words, word, right = [], "", None
+        for ch, x0, _, x1, _ in sorted(line, key=lambda c: c[1]):
+            if ch.isspace():
+                if word:
+                    words.append(word)
+                word, right = "", None
+                continue
+            if word and right is not None and x0 - right > X_TOLERANCE:
+                words.append(word)
+                word = ""
+            word += ch
+            right = x1
+        if word:
+            words.append(word)
+        if words:
+            out.append(" ".join(words))
+    return "\n".join(out)
+
+
+def grid_rows(chars, xs, ys):
+    """罫線の格子に文字を割り当て、上の行から順に表の行を返す（空の行は除く）"""
+    if len(xs) < 2 or len(ys) < 2:
+        return []
+    cells = {}
+    for ch in chars:
+        cx = (ch[1] + ch[3]) / 2
+        cy = (ch[2] + ch[4]) / 2
+        col = bisect_right(xs, cx) - 1
+        row = bisect_right(ys, cy) - 1
+        if 0 <= col < len(xs) - 1 and 0 <= row < len(ys) - 1:
+            cells.setdefault((row, col), []).append(ch)
+
+    rows = []
+    for r in reversed(range(len(ys) - 1)):  # PDF座標は下が原点なので上の行から
+        row = [_cell_text(cells.get((r, c), ())) for c in range(len(xs) - 1)]
+        if any(row):
+            rows.append(row)
+    return rows
+
+
+def fast_page_rows(page):
+    """
+    高速パス: 戻り値 (行, 文字があるか, 画像があるか)
+    """
+    import pypdfium2.raw as pdfium_c
+
+    textpage = page.get_textpage()
+    try:
+        chars = page_chars(textpage)
+    finally:
+        textpage.close()
+    if not chars:
+        has_image = any(True for _ in page.get_objects(filter=[pdfium_c.FPDF_PAGEOBJ_IMAGE]))
+        return [], False, has_image
+    xs, ys = ruling_lines(page)
+    return grid_rows(chars, xs, ys), True, False
+
+
+# =============================
+# ページ単位の抽出
+# =============================
+class PageExtractor:
+    """
+    1ファイル分のページ抽出器。
+
+    confidence を None にすると高速パスを使わず、全ページで表検出を行う（従来の動作）。
+    pdfplumber は表検出が必要になったときに初めて開く。
+
+        with PageExtractor(path) as extractor:
+            for i in range(extractor.page_count):
+                rows, tier = extractor.extract(i)
+    """
+
+    def __init__(self, pdf_path, confidence=DEFAULT_CONFIDENCE):
+        self.pdf_path = str(pdf_path)
+        self.confidence = confidence
+        self.tiers = Counter()
+        self._pdfium = None
+        self._plumber = None
+
+    def __enter__(self):
+        if self.confidence is not None:
+            try:
+                import pypdfium2 as pdfium
+
+                self._pdfium = pdfium.PdfDocument(self.pdf_path)
+            except ImportError:
+                self.confidence = None
+        if self._pdfium is None:
+            self.plumber()
+        return self
+
+    def __exit__(self, *exc):
+        if self._pdfium is not None:
+            self._pdfium.close()
+        if self._plumber is not None:
+            self._plumber.close()
+
+    @property
+    def page_count(self):
+        if self._pdfium is not None:
+            return len(self._pdfium)
+        return len(self.plumber().pages)
+
+    def plumber(self):
+        if self._plumber is None:
+            import pdfplumber
+
+            self._plumber = pdfplumber.open(self.pdf_path)
+        return self._plumber
+
+    def plumber_page(self, index):
+        return self.plumber().pages[index]
+
+    def extract(self, index):
+        """
+        1ページ分の行データと、使った段（fast / table / text_table / scanned）を返す。
+        scanned は文字がなく画像だけのページ（行は空。OCR は呼び出し側で行う）。
+        """
+        from ranking_ocr import is_image_only
+
+        if self._pdfium is not None:
+            page = self._pdfium[index]
+            try:
+                rows, has_text, has_image = fast_page_rows(page)
+            finally:
+                page.close()
+            if not has_text and has_image:
+                return self._done([], TIER_SCANNED)
+            score, _ = score_rows(rows)
+            if score is not None and score >= self.confidence:
+                return self._done(rows, TIER_FAST)
+
+        page = self.plumber_page(index)
+        if is_image_only(page):
+            return self._done([], TIER_SCANNED)
+        rows = extract_page_rows(page)
+        score, entries = score_rows(rows)
+        if self.confidence is not None and score is not None and score < self.confidence:
+            alt = extract_page_rows(page, TEXT_TABLE_SETTINGS)
+            alt_score, alt_entries = score_rows(alt)
+            # 文字位置ベースは空白を含む得意先名などで列がずれやすい。
+            # 同じ形（エントリ数・列数）のまま信頼度が上がる場合だけ採用する
+            if (alt_score is not None and alt_score > score and alt_entries == entries
+                    and _columns(alt) == _columns(rows)):
+                return self._done(alt, TIER_TEXT_TABLE)
+        return self._done(rows, TIER_TABLE)
+
+    def _done(self, rows, tier):
+        self.tiers[tier] += 1
+        return rows, tier
+
+    def summary(self):
+        labels = {TIER_FAST: "高速", TIER_TABLE: "表検出", TIER_TEXT_TABLE: "表検出(文字位置)",
+                  TIER_SCANNED: "画像"}
+        return " / ".join(f"{labels[t]} {n}" for t, n in self.tiers.items())
@@ -0,0 +1,390 @@
+"""
+ランキング表取り込みジョブのマニフェスト
+
+process_rankings.py / import_rankings_to_supabase.py / generate_insert_sql.py が
+共通で使う設定（入力PDF・ラベル・fiscal_period_id・レイアウト種別）を
+ranking_jobs.json から読み込む。
+
+マニフェストを編集する代わりに、フォルダを走査してファイル名
+（例: 「第84期 2024.06-2025.05 お客様ランキング表.pdf」）から期とレイアウトを
+推定する発見モードも用意している。前回実行時の状態ファイルと比較し、
+新規・変更のあったジョブだけを計画する。
+"""
+import hashlib
+import json
+import os
+import re
+import signal
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DEFAULT_MANIFEST = Path(__file__).with_name("ranking_jobs.json")
+# extract（PDF → CSV）済みのファイル
+STATE_FILENAME = ".ranking_state.json"
+# 監視デーモンで extract → parse → validate → load まで済んだファイル
+INGEST_STATE_FILENAME = ".ingest_state.json"
+
+# レイアウト種別
+LAYOUT_RANK = "rank"      # お客様ランキング表（順位別）
+LAYOUT_REP = "rep"        # 担当別ランキング表
+LAYOUT_LEGACY = "legacy"  # 2005〜2007年の売上順位表
+LAYOUTS = (LAYOUT_RANK, LAYOUT_REP, LAYOUT_LEGACY)
+
+LAYOUT_SUFFIX = {LAYOUT_RANK: "順位", LAYOUT_REP: "担当"}
+
+# 期首は6月（06〜05が通期）
+FISCAL_START_MONTH = 6
+
+
+# =============================
+# ジョブ定義
+# =============================
+@dataclass(frozen=True)
+class Job:
+    label: str
+    source: Path
+    fiscal_period_id: Optional[str] = None
+    layout: str = LAYOUT_RANK
+    period: Optional[str] = None
+    months: int = 12
+
+    @property
+    def is_full_year(self):
+        return self.months >= 12
+
+    def config_key(self):
+        """状態ファイルと比較するジョブ設定（ソース内容以外）"""
+        return {
+            "source": self.source.name,
+            "fiscal_period_id": self.fiscal_period_id,
+            "layout": self.layout,
+        }
+
+
+@dataclass
+class Manifest:
+    source_dir: Path
+    output_dir: Path
+    table: str = "customer_sales_rankings"
+    fiscal_periods: dict = field(default_factory=dict)
+    jobs: list = field(default_factory=list)
+    path: Optional[Path] = None
+
+    @property
+    def import_dir(self):
+        return self.output_dir / "supabase_import"
+
+    @property
+    def state_path(self):
+        return self.output_dir / STATE_FILENAME
+
+    @property
+    def ingest_state_path(self):
+        return self.output_dir / INGEST_STATE_FILENAME
+
+    def period_id(self, period):
+        if not period:
+            return None
+        return self.fiscal_periods.get(period)
+
+    def job(self, label):
+        for job in self.jobs:
+            if job.label == label:
+                return job
+        raise KeyError(label)
+
+
+def load_manifest(path=None, source_dir=None, output_dir=None):
+    """
+    マニフェストを読み込む。
+    パスの優先順位: 引数 > 環境変数 (RANKINGS_MANIFEST / RANKINGS_SOURCE_DIR /
+    RANKINGS_OUTPUT_DIR) > マニフェストの記載値
+    """
+    path = Path(path or os.environ.get("RANKINGS_MANIFEST") or DEFAULT_MANIFEST)
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    source_dir = Path(source_dir or os.environ.get("RANKINGS_SOURCE_DIR") or data["source_dir"])
+    output_dir = Path(output_dir or os.environ.get("RANKINGS_OUTPUT_DIR") or data["output_dir"])
+    fiscal_periods = data.get("fiscal_periods", {})
+
+    jobs = []
+    for item in data.get("jobs", []):
+        layout = item.get("layout", LAYOUT_RANK)
+        if layout not in LAYOUTS:
+            raise ValueError(f"{path.name}: 不明なレイアウト '{layout}' ({item.get('label')})")
+        source = Path(item["source"])
+        if not source.is_absolute():
+            source = source_dir / source
+        period = item.get("period")
+        info = parse_filename(source.name) or {}
+        jobs.append(Job(
+            label=item["label"],
+            source=source,
+            fiscal_period_id=item.get("fiscal_period_id") or fiscal_periods.get(period),
+            layout=layout,
+            period=period,
+            months=item.get("months", info.get("months", 12)),
+        ))
+
+    return Manifest(
+        source_dir=source_dir,
+        output_dir=output_dir,
+        table=data.get("table", "customer_sales_rankings"),
+        fiscal_periods=fiscal_periods,
+        jobs=jobs,
+        path=path,
+    )
+
+
+# =============================
+# ファイル名からの推定
+# =============================
+PERIOD_RE = re.compile(r"第\s*(\d+)\s*期")
+# 2024.06-2025.05 / 2015.06-05 / 2022.06-12
+RANGE_RE = re.compile(r"(\d{4})\.(\d{1,2})\s*-\s*(?:(\d{4})\.)?(\d{1,2})")
+# 20051001～ 20060930
+LEGACY_RANGE_RE = re.compile(r"(\d{4})(\d{2})\d{2}\s*[～~〜-]\s*(\d{4})(\d{2})\d{2}")
+
+
+def infer_layout(name):
+    if "担当" in name:
+        return LAYOUT_REP
+    if "売上順位表" in name:
+        return LAYOUT_LEGACY
+    return LAYOUT_RANK
+
+
+def parse_filename(name):
+    """
+    ファイル名から期・レイアウト・対象月数を推定する。
+    推定できない場合は None を返す。
+    """
+    name = Path(name).stem
+    layout = infer_layout(name)
+
+    m = LEGACY_RANGE_RE.search(name)
+    if m and not PERIOD_RE.search(name):
+        y1, m1, y2, m2 = (int(g) for g in m.groups())
+        return {
+            "label": f"{y1}-{y2}",
+            "period": None,
+            "layout": LAYOUT_LEGACY,
+            "months": (y2 - y1) * 12 + (m2 - m1) + 1,
+        }
+
+    m = PERIOD_RE.search(name)
+    if not m:
+        return None
+    period = f"第{int(m.group(1))}期"
+
+    months = 12
+    r = RANGE_RE.search(name)
+    if r:
+        start_month = int(r.group(2))
+        end_month = int(r.group(4))
+        months = (end_month - start_month) % 12 + 1
+
+    return {
+        "label": f"{period}_{LAYOUT_SUFFIX.get(layout, layout)}",
+        "period": period,
+        "layout": layout,
+        "months": months,
+    }
+
+
+def discover_jobs(folder, manifest=None, include_partial=False):
+    """
+    フォルダ内の PDF を走査してジョブを組み立てる。
+
+    - マニフェストに同じファイルがあれば、そのラベル・設定を優先する
+    - 同じ期・レイアウトに複数ファイルがある場合は対象月数が最も長いもの（通期）を残す
+    - 途中月のファイルは include_partial=True の場合か、マニフェストに記載がある場合のみ対象にする
+    - 対象外にしたファイルは理由を表示する
+    """
+    folder = Path(folder)
+    known = _known_jobs(manifest)
+
+    candidates = {}
+    for path in sorted(folder.glob("*.pdf")):
+        job = job_for_path(path, manifest, known)
+        if job is None:
+            continue
+
+        if not job.is_full_year and not include_partial and path.name not in known:
+            print(f"  ⏭️  途中月のファイルのためスキップ（--include-partial で対象）: {path.name}")
+            continue
+
+        key = (job.period or job.label, job.layout)
+        current = candidates.get(key)
+        if current is None or _prefer(job, current):
+            if current is not None:
+                _print_superseded(current, job)
+            candidates[key] = job
+        else:
+            _print_superseded(job, current)
+
+    return sorted(candidates.values(), key=lambda j: j.label)
+
+
+def _print_superseded(job, by):
+    print(f"  ⏭️  [{job.label}] {by.source.name} を優先するためスキップ: {job.source.name}")
+
+
+def _known_jobs(manifest):
+    if manifest is None:
+        return {}
+    return {job.source.name: job for job in manifest.jobs}
+
+
+def job_for_path(path, manifest=None, known=None):
+    """
+    1ファイル分のジョブを組み立てる（マニフェスト記載があればそれを優先）。
+    期を判別できないファイルは None を返す。
+    """
+    path = Path(path)
+    if known is None:
+        known = _known_jobs(manifest)
+    if path.name in known:
+        job = known[path.name]
+        return Job(job.label, path, job.fiscal_period_id, job.layout, job.period, job.months)
+
+    info = parse_filename(path.name)
+    if info is None:
+        print(f"  ⚠️  期を判別できません（スキップ）: {path.name}")
+        return None
+    fiscal_periods = manifest.fiscal_periods if manifest is not None else {}
+    job = Job(
+        label=info["label"],
+        source=path,
+        fiscal_period_id=fiscal_periods.get(info["period"]),
+        layout=info["layout"],
+        period=info["period"],
+        months=info["months"],
+    )
+    if job.period and not job.fiscal_period_id:
+        print(f"  ⚠️  {job.period} の fiscal_period_id がマニフェストにありません: {path.name}")
+    return job
+
+
+def _prefer(job, current):
+    if job.months != current.months:
+        return job.months > current.months
+    return job.source.stat().st_mtime_ns > current.source.stat().st_mtime_ns
+
+
+# =============================
+# 差分計画（新規・変更のみ）
+# =============================
+def file_digest(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_state(path):
+    path = Path(path)
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(path, state):
+    path = Path(path)
+    os.makedirs(path.parent, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+@contextmanager
+def state_lock(path):
+    """状態ファイルの読み込み〜保存をプロセス間で排他する（{path}.lock を使う）"""
+    lock_path = Path(path).with_suffix(".lock")
+    os.makedirs(lock_path.parent, exist_ok=True)
+    with open(lock_path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def update_state(path, updates):
+    """
+    updates（{label: 指紋}）を状態ファイルに反映する。
+    保存直前に読み直すため、並行して動く別プロセスの更新を上書きしない。
+    """
+    with state_lock(path):
+        state = load_state(path)
+        state.update(updates)
+        save_state(path, state)
+    return state
+
+
+def ignore_sigint():
+    """
+    プロセスプールのワーカー初期化用。Ctrl-C は親プロセスだけが受けて停止処理を行い、
+    ワーカーごとに KeyboardInterrupt のトレースバックが出ないようにする。
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def fingerprint(job, previous=None):
+    """
+    ソースファイルの指紋。サイズと更新時刻が前回と同じならハッシュ計算を省略する。
+    """
+    st = job.source.stat()
+    fp = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if previous and previous.get("size") == fp["size"] and previous.get("mtime_ns") == fp["mtime_ns"]:
+        fp["sha256"] = previous.get("sha256")
+    else:
+        fp["sha256"] = file_digest(job.source)
+    fp.update(job.config_key())
+    return fp
+
+
+def plan_jobs(jobs, state, output_dir=None, force=False):
+    """
+    実行が必要なジョブだけを返す。
+    戻り値: (実行するジョブ, {label: 新しい指紋})
+    """
+    planned = []
+    fingerprints = {}
+    for job in jobs:
+        if not job.source.exists():
+            print(f"  ❌ 見つかりません: {job.source.name}")
+            continue
+        previous = state.get(job.label)
+        fp = fingerprint(job, previous)
+        fingerprints[job.label] = fp
+
+        output_missing = output_dir is not None and not (Path(output_dir) / f"{job.label}.csv").exists()
+        if force or output_missing or previous is None or _changed(previous, fp):
+            planned.append(job)
+    return planned, fingerprints
+
+
+def _changed(previous, fp):
+    keys = ("sha256", "source", "fiscal_period_id", "layout")
+    return any(previous.get(k) != fp.get(k) for k in keys)
@@ -0,0 +1,148 @@
+"""
+画像のみのページ（スキャンPDF）の OCR
+
+2005〜2007年の売上順位表などスキャンされたページには文字情報がなく、
+extract_tables / extract_text では何も取れない。そうしたページを指定の解像度で
+画像に描画し、ローカルの tesseract で文字起こしする。
+
+- ページ単位でプロセスプールに分散する（tesseract は1プロセス1スレッドで動かす）
+- 結果はページ内容（埋め込み画像のバイト列）と OCR 設定のハッシュでキャッシュし、
+  再実行時は OCR を省く
+- 文字起こし結果は process_rankings.text_to_rows で表と同じ列構成にそろえる
+
+必要なもの: tesseract 本体と日本語データ (jpn)、pytesseract
+（未インストールの場合、画像のみのページは警告を出してスキップする）。
+tesseract が PATH にない場合は TESSERACT_CMD で実行ファイルを指定する。
+"""
+import hashlib
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+DEFAULT_DPI = 300
+DEFAULT_LANG = "jpn"
+DEFAULT_PSM = 6  # 単一のテキストブロックとして読む（表の行をそのまま1行にする）
+CACHE_DIRNAME = ".ocr_cache"
+
+
+@dataclass(frozen=True)
+class OcrConfig:
+    dpi: int = DEFAULT_DPI
+    lang: str = DEFAULT_LANG
+    psm: int = DEFAULT_PSM
+    workers: Optional[int] = None
+    cache_dir: Optional[Path] = None
+
+    def key(self):
+        """キャッシュキーに含める設定（結果が変わるものだけ）"""
+        return f"dpi={self.dpi};lang={self.lang};psm={self.psm}"
+
+
+def is_image_only(page):
+    """文字情報がなく画像だけのページ"""
+    return not page.chars and bool(page.images)
+
+
+def page_hash(page, config):
+    """ページに埋め込まれた画像のバイト列・配置と OCR 設定から作るキャッシュキー"""
+    h = hashlib.sha256()
+    h.update(config.key().encode())
+    h.update(f"{page.width:.2f}x{page.height:.2f}".encode())
+    for image in page.images:
+        h.update(repr((round(image["x0"], 2), round(image["top"], 2),
+                       round(image["x1"], 2), round(image["bottom"], 2))).encode())
+        stream = image.get("stream")
+        if stream is not None:
+            h.update(stream.get_rawdata() or b"")
+    return h.hexdigest()
+
+
+def tesseract_cmd():
+    return os.environ.get("TESSERACT_CMD") or "tesseract"
+
+
+def available():
+    return pytesseract is not None and shutil.which(tesseract_cmd()) is not None
+
+
+# =============================
+# キャッシュ
+# =============================
+def read_cache(cache_dir, digest):
+    if cache_dir is None:
+        return None
+    path = Path(cache_dir) / f"{digest}.txt"
+    if not path.exists():
+        return None
+    return path.read_text(encoding="utf-8")
+
+
+def write_cache(cache_dir, digest, text):
+    if cache_dir is None:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    path = Path(cache_dir) / f"{digest}.txt"
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+# =============================
+# OCR
+# =============================
+def ocr_page(pdf_path, index, config):
+    """1ページを描画して文字起こしする（プロセスプールのワーカーで実行）"""
+    import pdfplumber
+
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd()
+    # 並列度はプロセス数で決めるので、tesseract 自身の OpenMP スレッドは 1 本にする
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+    # 対象ページだけを読み込む
+    with pdfplumber.open(pdf_path, pages=[index + 1]) as pdf:
+        image = pdf.pages[0].to_image(resolution=config.dpi).original
+    return pytesseract.image_to_string(image, lang=config.lang, config=f"--psm {config.psm}")
+
+
+def ocr_pages(pdf_path, pages, config):
+    """
+    pages: {ページ番号(0始まり): page_hash}
+    戻り値: {ページ番号: テキスト}（OCR できなかったページは含まない）
+    """
+    name = Path(pdf_path).name
+    texts = {}
+    missing = {}
+    for index, digest in pages.items():
+        text = read_cache(config.cache_dir, digest)
+        if text is None:
+            missing[index] = digest
+        else:
+            texts[index] = text
+    cached = len(texts)
+
+    if missing and not available():
+        print(f"  ⚠️  {name}: tesseract / pytesseract が見つからないため、"
+              f"画像のみのページ {len(missing)} 件をスキップしました")
+        missing = {}
+
+    if missing:
+        workers = max(1, min(config.workers or os.cpu_count() or 1, len(missing)))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {index: pool.submit(ocr_page, str(pdf_path), index, config) for index in missing}
+            for index, future in futures.items():
+                try:
+                    texts[index] = future.result()
+                except Exception as e:
+                    print(f"  ⚠️  {name} p{index + 1}: OCR に失敗しました: {e}")
+                    continue
+                write_cache(config.cache_dir, missing[index], texts[index])
+
+    print(f"  🔎 {name}: OCR {len(pages)} ページ（キャッシュ {cached} / 新規 {len(texts) - cached}）")
+    return texts
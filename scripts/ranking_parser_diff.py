@@ -0,0 +1,273 @@
+"""
+エントリパーサーの差分比較ハーネス
+
+同じ CSV エントリ（iter_entries でまとめた順位ごとの行）を複数のパーサーに通し、
+出力をフィールド単位で比較する。ファイル単位で並列に処理し、
+不一致率・フィールドごとの不一致件数・パーサーごとのエントリ処理時間を報告する。
+
+比較対象は PARSERS に登録する。新しいパーサーは
+
+    @register_parser("my_parser")
+    def my_parser(entry, source_file):
+        return [record, ...]
+
+のように追加すれば自動的に比較に含まれる。
+
+    python ranking_parser_diff.py --input-dir <output_dir>/supabase_import --report diff.json
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from import_rankings_to_supabase import iter_entries, parse_entry
+from ranking_manifest import load_manifest
+from test_parse_csv_v2 import parse_entry_lines
+
+COMPARE_FIELDS = [
+    "rank", "customer_name_raw", "total",
+    "month_06", "month_07", "month_08", "month_09", "month_10", "month_11",
+    "month_12", "month_01", "month_02", "month_03", "month_04", "month_05",
+]
+MAX_EXAMPLES = 20
+
+PARSERS = {}
+
+
+def register_parser(name):
+    def wrap(func):
+        PARSERS[name] = func
+        return func
+    return wrap
+
+
+# =============================
+# 比較対象パーサー
+# =============================
+@register_parser("parse_entry")
+def _parse_entry(entry, source_file):
+    return parse_entry(entry, source_file)
+
+
+@register_parser("parse_entry_lines")
+def _parse_entry_lines(entry, source_file):
+    return parse_entry_lines(entry)
+
+
+# =============================
+# 正規化・比較
+# =============================
+def _int_or_none(value):
+    if value is None or value == "":
+        return None
+    try:
+        return int(str(value).replace(",", ""))
+    except ValueError:
+        return value
+
+
+def normalize(records):
+    """
+    period_type ごとに比較フィールドだけを取り出す（rank は数値に揃える）。
+    同じ period_type が重複した場合は上書きせず、2件目以降を "今期#2" のようなキーで残す
+    （片方のパーサーだけが重複を出すと present の差分として現れる）。
+    """
+    result = {}
+    for r in records:
+        row = {k: r.get(k) for k in COMPARE_FIELDS}
+        row["rank"] = _int_or_none(row["rank"])
+        pt = r.get("period_type")
+        key, n = pt, 1
+        while key in result:
+            n += 1
+            key = f"{pt}#{n}"
+        result[key] = row
+    return result
+
+
+def count_duplicates(normalized):
+    """normalize の結果に含まれる重複（同じ period_type の2件目以降）の件数"""
+    return sum(1 for key in normalized if isinstance(key, str) and "#" in key)
+
+
+def diff_outputs(outputs):
+    """
+    パーサー名 → 正規化出力 の dict を受け取り、不一致フィールドを返す。
+    戻り値: {"period_type.field": {パーサー名: 値}}
+    片方にしか無い期（今期/前期）は "period_type.present" として1件だけ記録する。
+    """
+    diffs = {}
+    period_types = sorted({pt for out in outputs.values() for pt in out}, key=str)
+    for pt in period_types:
+        rows = {name: out.get(pt) for name, out in outputs.items()}
+        if any(row is None for row in rows.values()):
+            diffs[f"{pt}.present"] = {name: row is not None for name, row in rows.items()}
+            continue
+        for field in COMPARE_FIELDS:
+            values = {name: row[field] for name, row in rows.items()}
+            if len(set(values.values())) > 1:
+                diffs[f"{pt}.{field}"] = values
+    return diffs
+
+
+# =============================
+# ファイル単位の実行（ワーカープロセス）
+# =============================
+def compare_file(path, parser_names, repeat=1):
+    source_file = Path(path).name
+    timings = {name: [] for name in parser_names}
+    errors = {name: 0 for name in parser_names}
+    duplicates = {name: 0 for name in parser_names}
+    field_mismatch = {}
+    examples = []
+    entries = 0
+    disagree = 0
+
+    for entry in iter_entries(path):
+        entries += 1
+        outputs = {}
+        for name in parser_names:
+            func = PARSERS[name]
+            try:
+                t0 = time.perf_counter_ns()
+                for _ in range(repeat):
+                    records = func(entry, source_file)
+                timings[name].append((time.perf_counter_ns() - t0) / repeat / 1000)
+                outputs[name] = normalize(records)
+                duplicates[name] += count_duplicates(outputs[name])
+            except Exception:
+                # 例外は出力なしとして扱い、present の差分として現れる
+                errors[name] += 1
+                outputs[name] = {}
+
+        diffs = diff_outputs(outputs)
+        if diffs:
+            disagree += 1
+            for key in diffs:
+                field = key.split(".", 1)[1]
+                field_mismatch[field] = field_mismatch.get(field, 0) + 1
+            if len(examples) < MAX_EXAMPLES:
+                examples.append({"source": source_file, "rank": entry.get("rank"),
+                                 "name": entry.get("name"), "diffs": diffs})
+
+    return {
+        "source": source_file,
+        "entries": entries,
+        "disagree": disagree,
+        "field_mismatch": field_mismatch,
+        "timings_us": timings,
+        "errors": errors,
+        "duplicates": duplicates,
+        "examples": examples,
+    }
+
+
+# =============================
+# 集計
+# =============================
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(q * (len(values) - 1))))
+    return values[idx]
+
+
+def summarize(results, parser_names):
+    entries = sum(r["entries"] for r in results)
+    disagree = sum(r["disagree"] for r in results)
+    field_mismatch = {}
+    for r in results:
+        for field, n in r["field_mismatch"].items():
+            field_mismatch[field] = field_mismatch.get(field, 0) + n
+
+    timing = {}
+    for name in parser_names:
+        values = [t for r in results for t in r["timings_us"][name]]
+        timing[name] = {
+            "total_ms": round(sum(values) / 1000, 2),
+            "mean_us": round(statistics.fmean(values), 1) if values else 0.0,
+            "p50_us": round(_percentile(values, 0.5), 1),
+            "p95_us": round(_percentile(values, 0.95), 1),
+            "errors": sum(r["errors"][name] for r in results),
+            "duplicates": sum(r.get("duplicates", {}).get(name, 0) for r in results),
+        }
+
+    return {
+        "parsers": parser_names,
+        "files": len(results),
+        "entries": entries,
+        "disagree": disagree,
+        "disagree_rate": round(disagree / entries, 4) if entries else 0.0,
+        "field_mismatch": dict(sorted(field_mismatch.items(), key=lambda kv: -kv[1])),
+        "timing": timing,
+        "per_file": [
+            {"source": r["source"], "entries": r["entries"], "disagree": r["disagree"],
+             "disagree_rate": round(r["disagree"] / r["entries"], 4) if r["entries"] else 0.0}
+            for r in results
+        ],
+        "examples": [ex for r in results for ex in r["examples"]][:MAX_EXAMPLES],
+    }
+
+
+def run_corpus(files, parser_names=None, workers=None, repeat=1):
+    parser_names = list(parser_names or PARSERS)
+    unknown = [n for n in parser_names if n not in PARSERS]
+    if unknown:
+        raise ValueError(f"未登録のパーサー: {', '.join(unknown)}")
+    files = sorted(str(f) for f in files)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(files) or 1))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(compare_file, files, [parser_names] * len(files), [repeat] * len(files)))
+    return summarize(results, parser_names)
+
+
+def print_summary(summary):
+    print(f"📊 {summary['files']} ファイル / {summary['entries']} エントリ")
+    print(f"   不一致: {summary['disagree']} 件 ({summary['disagree_rate']:.2%})")
+    for field, n in summary["field_mismatch"].items():
+        print(f"     {field:<18} {n}")
+    print("   処理時間（エントリあたり）:")
+    for name, t in summary["timing"].items():
+        print(f"     {name:<20} mean {t['mean_us']:>8.1f}µs  p50 {t['p50_us']:>8.1f}µs  "
+              f"p95 {t['p95_us']:>8.1f}µs  total {t['total_ms']:.1f}ms  errors {t['errors']}  "
+              f"duplicates {t['duplicates']}")
+    for f in summary["per_file"]:
+        if f["disagree"]:
+            print(f"   {f['source']}: {f['disagree']}/{f['entries']} ({f['disagree_rate']:.2%})")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="エントリパーサーの出力差分と処理時間を比較する")
+    parser.add_argument("files", nargs="*", help="比較する import用CSV（省略時は --input-dir 内すべて）")
+    parser.add_argument("--manifest", help="ジョブマニフェスト (既定: ranking_jobs.json)")
+    parser.add_argument("--input-dir", help="入力CSVフォルダ (既定: <output_dir>/supabase_import)")
+    parser.add_argument("--parsers", help=f"比較するパーサー（カンマ区切り、既定: {','.join(PARSERS)}）")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="並列プロセス数")
+    parser.add_argument("--repeat", type=int, default=1, help="計時のためにエントリごとに繰り返す回数")
+    parser.add_argument("--report", help="結果をJSONで保存するパス")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    files = args.files
+    if not files:
+        input_dir = args.input_dir or load_manifest(args.manifest).import_dir
+        files = glob.glob(os.path.join(input_dir, "*_import.csv"))
+    parser_names = args.parsers.split(",") if args.parsers else None
+
+    summary = run_corpus(files, parser_names, args.jobs, args.repeat)
+    print_summary(summary)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"Saved to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+ランキング表 1ファイル分のパイプライン
+
+extract（PDF → CSV） → parse（CSV → レコード） → validate → load（SQL出力）
+を1つのジョブについて順に実行し、ステータスレコードを返す。
+ranking_watch.py から1ファイル単位で呼び出される。
+"""
+import json
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from generate_insert_sql import BATCH_SIZE, build_insert_sql, escape_sql
+from import_rankings_to_supabase import process_file
+from ranking_query import refresh_sql
+
+STATUS_FILENAME = "ingest_status.jsonl"
+MONTH_KEYS = [
+    "month_06", "month_07", "month_08", "month_09", "month_10", "month_11",
+    "month_12", "month_01", "month_02", "month_03", "month_04", "month_05",
+]
+
+
+# =============================
+# 各ステージ
+# =============================
+def extract(job, output_dir):
+    """PDF → CSV（通常出力 + supabase_import 用）。import用CSVのパスを返す"""
+    # pdfplumber の読み込みは重いので、実際に抽出するときだけ import する
+    from process_rankings import process_one
+    from ranking_adaptive import DEFAULT_CONFIDENCE
+
+    rows = process_one(job.label, job.source, output_dir, job.fiscal_period_id, confidence=DEFAULT_CONFIDENCE)
+    if not rows:
+        return None
+    return Path(output_dir) / "supabase_import" / f"{job.label}_import.csv"
+
+
+def parse(import_path, months=12):
+    """CSV → レコード。months は途中月のファイルで値が入っている月数"""
+    return process_file(import_path, months)
+
+
+def validate(records, require_period_id=True):
+    """
+    レコードの整合性チェック。
+    errors が空でなければロードしない。warnings は件数だけ記録する。
+    """
+    errors = []
+    warnings = {"rank_missing": 0, "total_mismatch": 0, "zero_total": 0}
+
+    if not records:
+        errors.append("レコードが0件です")
+    if require_period_id and any(not r.get("fiscal_period_id") for r in records):
+        errors.append("fiscal_period_id が空のレコードがあります")
+
+    for r in records:
+        if r.get("rank") is None:
+            warnings["rank_missing"] += 1
+        month_sum = sum(r.get(k, 0) for k in MONTH_KEYS)
+        if month_sum and month_sum != r.get("total", 0):
+            warnings["total_mismatch"] += 1
+        if not r.get("total"):
+            warnings["zero_total"] += 1
+
+    return errors, warnings
+
+
+def load(records, source_file, output_dir, table, batch_size=BATCH_SIZE):
+    """
+    1ファイル分のSQLを出力する。
+    同じ source_file の既存行を削除してから挿入するため、再実行しても重複しない。
+    COMMIT の後で集計ビューを更新する。
+    """
+    sql_dir = Path(output_dir) / "sql_batches"
+    os.makedirs(sql_dir, exist_ok=True)
+    out_path = sql_dir / f"{Path(source_file).stem}.sql"
+
+    tmp = out_path.with_suffix(".sql.tmp")
+    with open(tmp, "w", encoding="utf-8") as out:
+        out.write("BEGIN;\n")
+        out.write(f"DELETE FROM {table} WHERE source_file = {escape_sql(source_file)};\n")
+        for i in range(0, len(records), batch_size):
+            out.write(build_insert_sql(records[i:i + batch_size], table))
+        out.write("COMMIT;\n")
+        out.write(refresh_sql(table))
+    os.replace(tmp, out_path)
+    return out_path
+
+
+# =============================
+# 1ファイル実行
+# =============================
+def run_job(job, output_dir, table):
+    """
+    1ジョブ分のパイプラインを実行してステータスレコードを返す。
+    例外は握りつぶさず status="failed" として記録する。
+    """
+    status = {
+        "label": job.label,
+        "source": job.source.name,
+        "fiscal_period_id": job.fiscal_period_id,
+        "status": "running",
+        "stages": {},
+    }
+    stage = "extract"
+    try:
+        t0 = time.perf_counter()
+        import_path = extract(job, output_dir)
+        status["stages"]["extract"] = round(time.perf_counter() - t0, 3)
+        if import_path is None:
+            status["status"] = "failed"
+            status["error"] = "抽出結果が0行です"
+            return finish(status)
+
+        stage = "parse"
+        t0 = time.perf_counter()
+        records = parse(import_path, job.months)
+        status["stages"]["parse"] = round(time.perf_counter() - t0, 3)
+        status["records"] = len(records)
+
+        stage = "validate"
+        errors, warnings = validate(records)
+        status["warnings"] = warnings
+        if errors:
+            status["status"] = "rejected"
+            status["errors"] = errors
+            return finish(status)
+
+        stage = "load"
+        t0 = time.perf_counter()
+        sql_path = load(records, import_path.name, output_dir, table)
+        status["stages"]["load"] = round(time.perf_counter() - t0, 3)
+        status["output"] = str(sql_path)
+        status["status"] = "ok"
+    except Exception as e:
+        status["status"] = "failed"
+        status["error"] = f"{stage}: {e}"
+    return finish(status)
+
+
+def finish(status):
+    status["finished_at"] = datetime.now(timezone.utc).isoformat()
+    return status
+
+
+def append_status(output_dir, status):
+    path = Path(output_dir) / STATUS_FILENAME
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(status, ensure_ascii=False) + "\n")
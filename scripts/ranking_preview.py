@@ -0,0 +1,324 @@
+"""
+ランキング表PDFのプレビュー（抜き取り検査）
+
+本番の抽出（全ページの extract_rows）を始める前に、先頭・中間・末尾など
+一部のページだけを抽出・パースして、次を数秒で確認する。
+
+- レイアウト（ファイル名・マニフェストから）と表の構造（表 / テキストのみ、列数、ヘッダー）
+- パース成功率（順位エントリのうちレコードになった割合、合計の不一致など）
+- サンプルレコード
+- 1ページあたりの実測コストから見積もった全ページ分の処理時間・メモリ
+  （メモリは別プロセスで RSS を測る。pdfium など C 側の確保分も含む）
+
+抽出・パースは process_rankings / import_rankings_to_supabase と同じ関数を使うため、
+プレビューで崩れるファイルは本番でも同じように崩れる。
+
+    python ranking_preview.py "第84期 2024.06-2025.05 お客様ランキング表.pdf" --samples 5
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from import_rankings_to_supabase import group_entries, parse_entry
+from process_rankings import deduplicate_rows, is_header_row, to_import_rows
+from ranking_adaptive import DEFAULT_CONFIDENCE, TIER_SCANNED, PageExtractor
+from ranking_manifest import LAYOUT_SUFFIX, job_for_path, load_manifest
+from ranking_pipeline import validate
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# fiscal_period_id が未設定のファイルでもパース結果を確認できるよう仮の値を入れる
+PLACEHOLDER_PERIOD_ID = "00000000-0000-0000-0000-000000000000"
+DEFAULT_SAMPLES = 3
+SAMPLE_RECORDS = 3
+MEMORY_BASIS_RSS = "rss"
+MEMORY_BASIS_HEAP = "python_heap"
+
+
+def sample_indexes(page_count, samples=DEFAULT_SAMPLES):
+    """先頭・末尾を含め、等間隔に samples ページを選ぶ（0始まり）"""
+    if page_count <= 0:
+        return []
+    if samples <= 1 or page_count == 1:
+        return [0]
+    step = (page_count - 1) / (samples - 1)
+    return sorted({round(i * step) for i in range(samples)})
+
+
+def describe_structure(rows):
+    """抽出行の形: 表として取れたか、列数の最頻値、ヘッダー行"""
+    widths = Counter(len(r) for r in rows)
+    columns = widths.most_common(1)[0][0] if widths else 0
+    header = next((r for r in rows if is_header_row(r)), None)
+    return {
+        "kind": "table" if columns > 1 else ("text" if rows else "empty"),
+        "columns": columns,
+        "header": header,
+    }
+
+
+def parse_rows(rows, period_id, source_file, months=12):
+    """import用の行に変換してエントリ → レコードまでパースする（対象外の月に値がある行は未パース扱い）"""
+    entries = list(group_entries(to_import_rows(rows, period_id)))
+    records = []
+    parsed = 0
+    for entry in entries:
+        try:
+            recs = parse_entry(entry, source_file, months)
+        except ValueError:
+            recs = []
+        parsed += bool(recs)
+        records.extend(recs)
+    return entries, parsed, records
+
+
+def _rss():
+    """現在の RSS（バイト）。/proc のない環境では None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _peak_rss():
+    """プロセス開始以来の最大 RSS（バイト、Linux の ru_maxrss は KB 単位）"""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _measure_memory(pdf_path, index, confidence):
+    """
+    RSS（pdfium など C 側の確保分を含む）で測る。保持される量は tracemalloc で Python の
+    オブジェクト（行データ・pdfplumber のページキャッシュ）を測り、RSS からは tracemalloc
+    自身の使用量を差し引く。
+    """
+    r0 = _rss()
+    if r0 is None or resource is None:
+        return _measure_heap(pdf_path, index, confidence)
+    tracemalloc.start()
+    try:
+        with PageExtractor(pdf_path, confidence) as extractor:
+            extractor.page_count  # ページ一覧の読み込みも open 時の量に含める
+            tracing = tracemalloc.get_tracemalloc_memory()
+            r1 = _rss() - tracing
+            base, _ = tracemalloc.get_traced_memory()
+            rows, _ = extractor.extract(index)
+            retained, _ = tracemalloc.get_traced_memory()
+            peak = _peak_rss() - tracemalloc.get_tracemalloc_memory()
+            del rows
+    finally:
+        tracemalloc.stop()
+    per_page = max(0, retained - base)
+    return {"open": max(0, r1 - r0), "per_page": per_page,
+            "working": max(0, peak - r1 - per_page), "basis": MEMORY_BASIS_RSS}
+
+
+def _measure_heap(pdf_path, index, confidence):
+    """RSS が取れない環境の代替（tracemalloc。Python ヒープのみで pdfium の確保分は含まない）"""
+    tracemalloc.start()
+    try:
+        with PageExtractor(pdf_path, confidence) as extractor:
+            extractor.page_count
+            base, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            rows, _ = extractor.extract(index)
+            retained, peak = tracemalloc.get_traced_memory()
+            del rows
+    finally:
+        tracemalloc.stop()
+    return {"open": base, "per_page": max(0, retained - base), "working": max(0, peak - retained),
+            "basis": MEMORY_BASIS_HEAP}
+
+
+def measure_memory(pdf_path, index, confidence=DEFAULT_CONFIDENCE):
+    """
+    1ページ抽出したときのメモリ。open 時の増分・抽出後も保持される量・抽出中のピークを返す。
+    RSS の最大値はプロセス単位でしか取れないため、新しいプロセス（spawn）で測る。計時とは別に測る。
+    basis は測り方（"rss" か、RSS が取れない環境での "python_heap"）。
+    """
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(_measure_memory, str(pdf_path), index, confidence).result()
+
+
+def preview(pdf_path, job=None, samples=DEFAULT_SAMPLES, sample_records=SAMPLE_RECORDS,
+            confidence=DEFAULT_CONFIDENCE):
+    """
+    抜き取りページだけを抽出・パースしてレポート（dict）を返す。
+    confidence は本番と同じ二段階抽出のしきい値（None なら全ページで表検出）。
+    """
+    pdf_path = Path(pdf_path)
+    period_id = job.fiscal_period_id if job else None
+    warnings = []
+    if job is None:
+        warnings.append("期を判別できません（本番の発見モードではスキップされます）")
+    elif not period_id:
+        warnings.append("fiscal_period_id が未設定です（本番ではすべての行がスキップされます）")
+
+    t0 = time.perf_counter()
+    with PageExtractor(pdf_path, confidence) as extractor:
+        page_count = extractor.page_count
+        open_seconds = time.perf_counter() - t0
+        indexes = sample_indexes(page_count, samples)
+
+        sampled = []
+        all_rows = []
+        for index in indexes:
+            t0 = time.perf_counter()
+            rows, tier = extractor.extract(index)
+            sampled.append({"page": index + 1, "rows": len(rows), "tier": tier,
+                            "seconds": time.perf_counter() - t0})
+            all_rows.extend(rows)
+    scanned = sum(1 for s in sampled if s["tier"] == TIER_SCANNED)
+
+    # process_one と同じく重複行（ページごとのヘッダーなど）を除く
+    all_rows = deduplicate_rows(all_rows)
+    t0 = time.perf_counter()
+    entries, parsed, records = parse_rows(all_rows, period_id or PLACEHOLDER_PERIOD_ID, pdf_path.name,
+                                          job.months if job else 12)
+    parse_seconds = time.perf_counter() - t0
+    _, record_warnings = validate(records, require_period_id=False)
+
+    structure = describe_structure(all_rows)
+    if scanned:
+        warnings.append(f"画像のみのページがあります（抜き取り {scanned} / {len(indexes)}、--ocr で取り込めます）")
+    if structure["kind"] == "empty":
+        warnings.append("行を抽出できません")
+    elif structure["kind"] == "text":
+        warnings.append("表を検出できません（列に分けられないテキスト行は import用CSVでスキップされます）")
+    if all_rows and not entries:
+        warnings.append("順位で始まる行がありません（列構成を確認してください）")
+    flagged = {k: v for k, v in record_warnings.items() if v}
+    if flagged:
+        warnings.append(f"整合性の警告: {flagged}")
+    clean = sum(1 for r in records if not any(validate([r], require_period_id=False)[1].values()))
+
+    memory = measure_memory(pdf_path, indexes[len(indexes) // 2], confidence) if indexes else None
+
+    # 全ページ分の見積もり（抽出はページ数に比例、パースは行数に比例）
+    per_page = statistics.mean(s["seconds"] for s in sampled) if sampled else 0.0
+    scale = page_count / len(sampled) if sampled else 0
+    projected_seconds = open_seconds + per_page * page_count + parse_seconds * scale
+    projected_memory = None
+    if memory:
+        projected_memory = memory["open"] + memory["per_page"] * page_count + memory["working"]
+
+    layout = job.layout if job else None
+    return {
+        "file": pdf_path.name,
+        "label": job.label if job else None,
+        "fiscal_period_id": period_id,
+        "layout": layout,
+        "layout_name": LAYOUT_SUFFIX.get(layout, layout),
+        "structure": structure,
+        "pages": page_count,
+        "sampled_pages": sampled,
+        "rows": len(all_rows),
+        "entries": len(entries),
+        "parsed_entries": parsed,
+        "parse_rate": parsed / len(entries) if entries else 0.0,
+        "records": len(records),
+        "record_warnings": record_warnings,
+        "clean_rate": clean / len(records) if records else 0.0,
+        "sample_records": records[:sample_records],
+        "projected": {
+            "seconds": projected_seconds,
+            "rows": round(len(all_rows) * scale),
+            "records": round(len(records) * scale),
+            "memory_bytes": projected_memory,
+            "memory_basis": memory["basis"] if memory else None,
+        },
+        "warnings": warnings,
+    }
+
+
+def _mb(n):
+    return f"{n / 1024 / 1024:.1f}MB" if n is not None else "不明"
+
+
+def print_report(report):
+    s = report["structure"]
+    print(f"📄 {report['file']}")
+    print(f"   ラベル: {report['label'] or '-'} / レイアウト: {report['layout_name'] or '-'} "
+          f"/ fiscal_period_id: {report['fiscal_period_id'] or '-'}")
+    print(f"   構造: {s['kind']} ({s['columns']} 列)  ヘッダー: {s['header'] or '-'}")
+    pages = ", ".join(f"p{p['page']} {p['rows']}行 {p['tier']} {p['seconds']:.2f}s"
+                      for p in report["sampled_pages"])
+    print(f"   抜き取り: {len(report['sampled_pages'])} / {report['pages']} ページ ({pages})")
+    print(f"   パース: {report['parsed_entries']} / {report['entries']} エントリ ({report['parse_rate']:.0%}), "
+          f"{report['records']} レコード, 警告なし {report['clean_rate']:.0%}")
+    for r in report["sample_records"]:
+        months = [r[k] for k in r if k.startswith("month_")]
+        print(f"     #{r['rank']} {r['customer_name_raw']} [{r['period_type']}] "
+              f"合計 {r['total']:,} (月計 {sum(months):,})")
+    p = report["projected"]
+    memory = _mb(p["memory_bytes"])
+    if p.get("memory_basis") == MEMORY_BASIS_HEAP:
+        memory += "（Python ヒープのみ）"
+    print(f"   全体見積もり: 約 {p['seconds']:.1f}s, メモリ約 {memory}, "
+          f"{p['rows']} 行 / {p['records']} レコード")
+    for w in report["warnings"]:
+        print(f"   ⚠️  {w}")
+
+
+def preview_files(paths, manifest=None, samples=DEFAULT_SAMPLES, confidence=DEFAULT_CONFIDENCE):
+    reports = []
+    for path in paths:
+        path = Path(path)
+        if not path.exists():
+            print(f"  ❌ 見つかりません: {path}")
+            continue
+        try:
+            report = preview(path, job_for_path(path, manifest), samples, confidence=confidence)
+        except Exception as e:
+            # 開けないPDFは全件抽出を始める前にここで落とす
+            print(f"  ❌ {path.name}: {e}")
+            report = {"file": path.name, "error": str(e)}
+        else:
+            print_report(report)
+        reports.append(report)
+    return reports
+
+
+def is_usable(report):
+    """本番で取り込めそうか（1件以上パースできる）"""
+    return "error" not in report and report["parsed_entries"] > 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="ランキング表PDFの抜き取りプレビュー")
+    parser.add_argument("files", nargs="+", help="プレビューするPDF")
+    parser.add_argument("--manifest", help="ジョブマニフェスト (既定: ranking_jobs.json)")
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES, help="抜き取るページ数")
+    parser.add_argument("--report", help="結果をJSONで保存するパス")
+    parser.add_argument("--full-tables", action="store_true", help="全ページで表検出を行う")
+    parser.add_argument("--confidence", type=float, default=DEFAULT_CONFIDENCE,
+                        help="高速パスの結果を採用する信頼度の下限")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    confidence = None if args.full_tables else args.confidence
+    reports = preview_files(args.files, load_manifest(args.manifest), args.samples, confidence)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+    return 0 if reports and all(is_usable(r) for r in reports) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
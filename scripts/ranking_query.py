@@ -0,0 +1,129 @@
+"""
+顧客売上ランキングの問い合わせ（キーセットページング）
+
+OFFSET を使わず、直前ページ最後の行のキーを次ページの開始位置として渡す。
+どのページも集計ビューのインデックスを範囲走査するだけで済み、
+ページが深くなっても応答時間が変わらない。
+
+    page = top_for_period(conn, period_id, limit=50)
+    page = top_for_period(conn, period_id, limit=50, after=page["next"])
+
+集計ビューは migrations/20260321000000_customer_sales_ranking_rollups.sql を参照。
+"""
+# 集計ビューの元テーブル。取り込み処理はすべてこのテーブルへ投入する
+ROLLUP_SOURCE_TABLE = "customer_sales_rankings"
+PERIOD_VIEW = "public.mv_customer_sales_ranking_period"
+CUSTOMER_VIEW = "public.mv_customer_sales_ranking_customer"
+
+PERIOD_COLUMNS = [
+    "fiscal_period_id", "period_no", "period_type", "rank", "customer_name_raw",
+    "sales_rep_name_raw", "department_name_raw",
+    "month_06", "month_07", "month_08", "month_09", "month_10", "month_11",
+    "month_12", "month_01", "month_02", "month_03", "month_04", "month_05", "total",
+]
+CUSTOMER_COLUMNS = [
+    "customer_name_raw", "period_count", "lifetime_total", "best_rank",
+    "first_period_no", "latest_period_no", "latest_total", "latest_rank",
+]
+
+
+def _fetch(conn, query, params):
+    with conn.cursor() as cur:
+        cur.execute(query, params)
+        names = [d[0] for d in cur.description]
+        return [dict(zip(names, row)) for row in cur.fetchall()]
+
+
+def _page(rows, limit, key):
+    """limit + 1 件取得して次ページの有無を判定する"""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {"rows": rows, "next": key(rows[-1]) if has_more and rows else None}
+
+
+def top_for_period(conn, fiscal_period_id, period_type="今期", limit=50, after=None):
+    """期別ランキング。キー: (rank, customer_name_raw)"""
+    query = f"""
+        SELECT {", ".join(PERIOD_COLUMNS)}
+        FROM {PERIOD_VIEW}
+        WHERE fiscal_period_id = %s AND period_type = %s
+    """
+    params = [fiscal_period_id, period_type]
+    if after:
+        query += " AND (rank, customer_name_raw) > (%s, %s)"
+        params += [after["rank"], after["customer_name_raw"]]
+    query += " ORDER BY rank, customer_name_raw LIMIT %s"
+    params.append(limit + 1)
+    rows = _fetch(conn, query, params)
+    return _page(rows, limit, lambda r: {"rank": r["rank"], "customer_name_raw": r["customer_name_raw"]})
+
+
+def customer_history(conn, customer_name, period_type="今期", limit=20, after=None):
+    """
+    顧客別の期推移（期番号の昇順）。キー: (period_no, fiscal_period_id)
+    期番号のない期（2005-2006 などの旧形式、period_no が NULL）は 0 として先頭に並べる。
+    期番号だけをキーにすると、同じ期番号・NULL の行がページの境目で抜け落ちる。
+    """
+    query = f"""
+        SELECT {", ".join(PERIOD_COLUMNS)}
+        FROM {PERIOD_VIEW}
+        WHERE customer_name_raw = %s AND period_type = %s
+    """
+    params = [customer_name, period_type]
+    if after:
+        query += " AND (COALESCE(period_no, 0), fiscal_period_id) > (%s, %s)"
+        params += [after["period_no"] or 0, after["fiscal_period_id"]]
+    query += " ORDER BY COALESCE(period_no, 0), fiscal_period_id LIMIT %s"
+    params.append(limit + 1)
+    rows = _fetch(conn, query, params)
+    return _page(rows, limit, lambda r: {"period_no": r["period_no"], "fiscal_period_id": r["fiscal_period_id"]})
+
+
+def top_customers(conn, limit=50, after=None):
+    """累計売上の上位顧客。キー: (lifetime_total DESC, customer_name_raw)"""
+    query = f"SELECT {', '.join(CUSTOMER_COLUMNS)} FROM {CUSTOMER_VIEW}"
+    params = []
+    if after:
+        query += """
+            WHERE lifetime_total < %s
+               OR (lifetime_total = %s AND customer_name_raw > %s)
+        """
+        params += [after["lifetime_total"], after["lifetime_total"], after["customer_name_raw"]]
+    query += " ORDER BY lifetime_total DESC, customer_name_raw LIMIT %s"
+    params.append(limit + 1)
+    rows = _fetch(conn, query, params)
+    return _page(rows, limit,
+                 lambda r: {"lifetime_total": r["lifetime_total"], "customer_name_raw": r["customer_name_raw"]})
+
+
+# ロード用の SQL ファイルの末尾に付ける更新文（関数が未作成の環境では何もしない）
+REFRESH_SQL = """DO $$
+BEGIN
+    IF to_regprocedure('public.refresh_customer_sales_ranking_rollups()') IS NOT NULL THEN
+        PERFORM public.refresh_customer_sales_ranking_rollups();
+    END IF;
+END
+$$;
+"""
+
+
+def refresh_sql(table):
+    """table へのロード後に流す集計ビューの更新文（元テーブル以外へのロードなら空）"""
+    return REFRESH_SQL if table.split(".")[-1] == ROLLUP_SOURCE_TABLE else ""
+
+
+def check_rollup_source(table):
+    """投入先が集計ビューの元テーブルでなければ ValueError（別テーブルへ入れても更新されないため）"""
+    if table.split(".")[-1] != ROLLUP_SOURCE_TABLE:
+        raise ValueError(f"集計ビューは {ROLLUP_SOURCE_TABLE} を元にしています（投入先: {table}）")
+
+
+def refresh_rollups(conn):
+    """集計ビューを更新する（関数が未作成の環境では何もしない）"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regprocedure('public.refresh_customer_sales_ranking_rollups()') IS NOT NULL")
+        if not cur.fetchone()[0]:
+            return False
+        cur.execute("SELECT public.refresh_customer_sales_ranking_rollups()")
+    conn.commit()
+    return True
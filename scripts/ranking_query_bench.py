@@ -0,0 +1,131 @@
+"""
+ランキング問い合わせのベンチマーク（ローカル PostgreSQL 用）
+
+現在の getCustomerSalesRankings 相当（テーブル全件を rank 順に取得）と、
+集計ビュー + キーセットページングによる「期Xの上位50社」「顧客Yの推移」を比較し、
+応答時間と転送量（JSON換算のバイト数）を表示する。
+
+    python ranking_query_bench.py --dsn postgresql://postgres@localhost/postgres --seed 10 3000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+
+from ranking_query import customer_history, refresh_rollups, top_for_period
+
+try:
+    import psycopg
+except ImportError:
+    psycopg = None
+
+
+def seed(conn, periods, customers, table="customer_sales_rankings"):
+    """期 × 顧客 × 今期/前期 の合成データを投入する（ベンチマーク用）"""
+    months = ["month_06", "month_07", "month_08", "month_09", "month_10", "month_11",
+              "month_12", "month_01", "month_02", "month_03", "month_04", "month_05"]
+    with conn.cursor() as cur:
+        for p in range(periods):
+            period_no = 75 + p
+            cur.execute("SELECT gen_random_uuid()::text")
+            period_id = cur.fetchone()[0]
+            columns = ["fiscal_period_id", "rank", "customer_name_raw", "sales_rep_name_raw",
+                       "period_type", *months, "total", "source_file", "doc_type"]
+            with cur.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+                for period_type in ("今期", "前期"):
+                    for rank in range(1, customers + 1):
+                        values = [random.randint(0, 1_000_000) for _ in months]
+                        copy.write_row([period_id, rank, f"顧客{rank:05d}", f"担当{rank % 20}", period_type,
+                                        *values, sum(values), f"第{period_no}期_順位_import.csv", ""])
+    conn.commit()
+    refresh_rollups(conn)
+
+
+def measure(func, iterations):
+    times = []
+    result = None
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        result = func()
+        times.append((time.perf_counter() - t0) * 1000)
+    rows = result["rows"] if isinstance(result, dict) else result
+    size = len(json.dumps(rows, ensure_ascii=False, default=str).encode("utf-8"))
+    return {
+        "median_ms": statistics.median(times),
+        "p95_ms": sorted(times)[max(0, int(len(times) * 0.95) - 1)],
+        "rows": len(rows),
+        "bytes": size,
+    }
+
+
+def full_fetch(conn, table):
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT * FROM {table} ORDER BY rank")
+        names = [d[0] for d in cur.description]
+        return [dict(zip(names, row)) for row in cur.fetchall()]
+
+
+def deep_page(conn, period_id, pages, limit=50):
+    page = top_for_period(conn, period_id, limit=limit)
+    for _ in range(pages - 1):
+        if not page["next"]:
+            break
+        page = top_for_period(conn, period_id, limit=limit, after=page["next"])
+    return page
+
+
+def run(conn, table, iterations):
+    with conn.cursor() as cur:
+        cur.execute("SELECT DISTINCT fiscal_period_id::text FROM mv_customer_sales_ranking_period")
+        periods = [r[0] for r in cur.fetchall()]
+        cur.execute("SELECT customer_name_raw FROM mv_customer_sales_ranking_customer "
+                    "ORDER BY lifetime_total DESC LIMIT 100")
+        customers = [r[0] for r in cur.fetchall()]
+    if not periods or not customers:
+        raise SystemExit("集計ビューが空です（--seed でデータを投入するか、ロード後に実行してください）")
+    period_id = random.choice(periods)
+    customer = random.choice(customers)
+
+    cases = {
+        "full fetch (現行)": lambda: full_fetch(conn, table),
+        "top 50 / period": lambda: top_for_period(conn, period_id, limit=50),
+        "pages 1-10 (keyset)": lambda: deep_page(conn, period_id, 10),
+        "customer history": lambda: customer_history(conn, customer),
+    }
+    results = {name: measure(func, iterations) for name, func in cases.items()}
+
+    base = results["full fetch (現行)"]
+    print(f"{'case':<20} {'median':>10} {'p95':>10} {'rows':>8} {'bytes':>12} {'vs full':>9}")
+    for name, r in results.items():
+        speedup = base["median_ms"] / r["median_ms"] if r["median_ms"] else float("inf")
+        print(f"{name:<20} {r['median_ms']:>8.2f}ms {r['p95_ms']:>8.2f}ms {r['rows']:>8} "
+              f"{r['bytes']:>12,} {speedup:>8.1f}x")
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="ランキング問い合わせのベンチマーク")
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL"), help="PostgreSQL 接続文字列")
+    parser.add_argument("--table", default="customer_sales_rankings")
+    parser.add_argument("--seed", nargs=2, type=int, metavar=("PERIODS", "CUSTOMERS"),
+                        help="合成データを投入してから計測する")
+    parser.add_argument("--iterations", type=int, default=20)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if psycopg is None:
+        raise SystemExit("psycopg がインストールされていません (pip install 'psycopg[binary]')")
+    if not args.dsn:
+        raise SystemExit("DATABASE_URL（または --dsn）を指定してください")
+    with psycopg.connect(args.dsn) as conn:
+        if args.seed:
+            seed(conn, *args.seed, table=args.table)
+        run(conn, args.table, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
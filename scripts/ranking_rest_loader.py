@@ -0,0 +1,273 @@
+"""
+PostgREST（Supabase REST）経由のランキング取り込み
+
+SQL ファイルを流せない環境向けに、rankings_to_insert.json のレコードを
+REST エンドポイントへ非同期・並列に POST する。
+
+- httpx.AsyncClient のコネクションプールを共有し、同時リクエスト数を制限する
+- 429 / 5xx / 通信エラーは指数バックオフ（Retry-After があれば優先）で再試行する
+  各行には送信前にクライアント側で id（uuid4）を付け、on_conflict=id,fiscal_period_id と
+  resolution=ignore-duplicates で POST する。タイムアウトや 5xx の後にサーバー側で
+  登録済みだったバッチを再送しても重複しない
+- 再試行を使い切ったバッチは失敗として数え、ほかのバッチは続ける
+- 応答時間に応じてバッチサイズを増減し、413 の場合はバッチを分割して再投入する
+
+必要パッケージ: httpx
+
+    SUPABASE_URL=... SUPABASE_SERVICE_ROLE_KEY=... python ranking_rest_loader.py --replace
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from generate_insert_sql import INPUT_JSON
+from ranking_manifest import load_manifest
+from ranking_query import check_rollup_source
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# 再送しても重複しないよう、主キー（パーティションキーを含む）が衝突した行は無視させる
+CONFLICT_COLUMNS = "id,fiscal_period_id"
+INSERT_HEADERS = {"Prefer": "return=minimal,resolution=ignore-duplicates"}
+
+
+@dataclass
+class LoadStats:
+    rows: int = 0
+    requests: int = 0
+    retries: int = 0
+    splits: int = 0
+    failed_rows: int = 0
+    errors: list = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+class AdaptiveBatch:
+    """
+    応答時間を見てバッチサイズを調整する（AIMD）。
+    目標時間より速ければ少しずつ増やし、遅い・拒否されたら半分にする。
+    """
+
+    def __init__(self, size, min_size, max_size, target_seconds):
+        self.size = size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target = target_seconds
+
+    def success(self, rows, seconds):
+        if seconds < self.target and rows >= self.size:
+            self.size = min(self.max_size, int(self.size * 1.25) + 1)
+        elif seconds > self.target * 2:
+            self.shrink()
+
+    def shrink(self):
+        self.size = max(self.min_size, self.size // 2)
+
+
+def to_row(record):
+    """送信用の行。id は最初の送信前に一度だけ付け、再送でも同じ値を使う"""
+    row = dict(record)
+    row.setdefault("id", str(uuid.uuid4()))
+    # uuid 列に空文字は入らないので NULL にする
+    if not row.get("fiscal_period_id"):
+        row["fiscal_period_id"] = None
+    return row
+
+
+class RestLoader:
+    def __init__(self, base_url, api_key, table="customer_sales_rankings", concurrency=4,
+                 batch_size=500, min_batch=50, max_batch=5000, target_seconds=2.0,
+                 max_retries=6, backoff=0.5, timeout=60.0, client=None):
+        self.table = table
+        self.endpoint = f"{base_url.rstrip('/')}/rest/v1/{table}"
+        self.rpc_endpoint = f"{base_url.rstrip('/')}/rest/v1/rpc/refresh_customer_sales_ranking_rollups"
+        self.headers = {
+            "apikey": api_key,
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "Prefer": "return=minimal",
+        }
+        self.concurrency = concurrency
+        self.batch = AdaptiveBatch(batch_size, min_batch, max_batch, target_seconds)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.client = client
+        self.stats = LoadStats()
+
+    # -----------------------------
+    # HTTP
+    # -----------------------------
+    async def _request(self, client, method, params=None, payload=None, url=None, headers=None):
+        """
+        再試行付きリクエスト。成功時はレスポンスを返す。
+        再試行不能なエラー（4xx）はそのままレスポンスを返し、呼び出し側で判断する。
+        """
+        attempt = 0
+        while True:
+            self.stats.requests += 1
+            try:
+                resp = await client.request(method, url or self.endpoint, params=params,
+                                            json=payload, headers={**self.headers, **(headers or {})})
+                if resp.status_code not in RETRY_STATUS:
+                    return resp
+                delay = self._retry_after(resp)
+            except httpx.TransportError as e:
+                resp, delay = e, None
+
+            attempt += 1
+            if attempt > self.max_retries:
+                if isinstance(resp, Exception):
+                    raise resp
+                return resp
+            self.stats.retries += 1
+            if getattr(resp, "status_code", None) == 429:
+                self.batch.shrink()
+            if delay is None:
+                delay = self.backoff * (2 ** (attempt - 1))
+                delay += random.uniform(0, delay / 2)
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _retry_after(resp):
+        value = resp.headers.get("Retry-After")
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            return None
+
+    # -----------------------------
+    # 投入
+    # -----------------------------
+    async def _worker(self, client, records, state):
+        while True:
+            if state["retry"]:
+                rows = state["retry"].pop()
+            elif state["offset"] < len(records):
+                start = state["offset"]
+                state["offset"] = start + self.batch.size
+                rows = records[start:state["offset"]]
+            else:
+                return
+
+            t0 = time.perf_counter()
+            try:
+                resp = await self._request(client, "POST", params={"on_conflict": CONFLICT_COLUMNS},
+                                           payload=rows, headers=INSERT_HEADERS)
+            except httpx.TransportError as e:
+                # 再試行を使い切ったバッチは失敗として数える（ほかのバッチは続ける）
+                self.stats.failed_rows += len(rows)
+                self.stats.errors.append(f"{type(e).__name__}: {e}")
+                continue
+            seconds = time.perf_counter() - t0
+
+            if resp.status_code < 300:
+                self.stats.rows += len(rows)
+                self.batch.success(len(rows), seconds)
+            elif resp.status_code == 413 and len(rows) > 1:
+                # 大きすぎるバッチは分割して再投入
+                self.stats.splits += 1
+                self.batch.shrink()
+                mid = len(rows) // 2
+                state["retry"].extend([rows[:mid], rows[mid:]])
+            else:
+                self.stats.failed_rows += len(rows)
+                self.stats.errors.append(f"HTTP {resp.status_code}: {resp.text[:200]}")
+
+    async def delete_sources(self, client, sources):
+        """source_file 単位で既存行を削除する（再取り込み用）"""
+        for source in sorted(sources):
+            resp = await self._request(client, "DELETE", params={"source_file": f"eq.{source}"})
+            if resp.status_code >= 300:
+                raise RuntimeError(f"削除に失敗しました ({source}): HTTP {resp.status_code} {resp.text[:200]}")
+
+    async def refresh_rollups(self, client):
+        """ロード後に集計ビュー（mv_customer_sales_ranking_*）を更新する"""
+        resp = await self._request(client, "POST", payload={}, url=self.rpc_endpoint)
+        if resp.status_code >= 300:
+            self.stats.errors.append(f"集計ビューの更新に失敗: HTTP {resp.status_code}: {resp.text[:200]}")
+
+    async def load(self, records, replace=False, refresh=True):
+        if httpx is None:
+            raise RuntimeError("httpx がインストールされていません (pip install httpx)")
+        if refresh:
+            check_rollup_source(self.table)
+        limits = httpx.Limits(max_connections=self.concurrency,
+                              max_keepalive_connections=self.concurrency)
+        client = self.client or httpx.AsyncClient(limits=limits, timeout=self.timeout)
+        t0 = time.perf_counter()
+        try:
+            if replace:
+                await self.delete_sources(client, {r.get("source_file") for r in records if r.get("source_file")})
+            state = {"offset": 0, "retry": []}
+            rows = [to_row(r) for r in records]
+            workers = [asyncio.ensure_future(self._worker(client, rows, state))
+                       for _ in range(self.concurrency)]
+            try:
+                await asyncio.gather(*workers)
+            except BaseException:
+                # クライアントを閉じる前に残りのワーカーを止める
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                raise
+            if refresh and self.stats.rows:
+                await self.refresh_rollups(client)
+        finally:
+            if self.client is None:
+                await client.aclose()
+        self.stats.elapsed = time.perf_counter() - t0
+        return self.stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="ランキングレコードを Supabase REST へ投入する")
+    parser.add_argument("--manifest", help="ジョブマニフェスト (既定: ranking_jobs.json)")
+    parser.add_argument("--input", default=str(INPUT_JSON), help="入力JSON")
+    parser.add_argument("--url", default=os.environ.get("SUPABASE_URL"), help="Supabase / PostgREST のURL")
+    parser.add_argument("--key", default=os.environ.get("SUPABASE_SERVICE_ROLE_KEY"), help="APIキー")
+    parser.add_argument("--table", help="投入先テーブル (既定: マニフェストの table)")
+    parser.add_argument("--concurrency", type=int, default=4, help="同時リクエスト数")
+    parser.add_argument("--batch-size", type=int, default=500, help="初期バッチサイズ")
+    parser.add_argument("--replace", action="store_true", help="同じ source_file の既存行を削除してから投入する")
+    parser.add_argument("--no-refresh", dest="refresh", action="store_false",
+                        help="投入後に集計ビューを更新しない（既定では更新する）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.url or not args.key:
+        raise SystemExit("SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY（または --url / --key）を指定してください")
+    table = args.table or load_manifest(args.manifest).table
+
+    with open(Path(args.input), "r", encoding="utf-8") as f:
+        records = json.load(f)
+
+    loader = RestLoader(args.url, args.key, table, concurrency=args.concurrency, batch_size=args.batch_size)
+    print(f"Loading {len(records)} records into {table} ...")
+    stats = asyncio.run(loader.load(records, replace=args.replace, refresh=args.refresh))
+    print(f"Loaded {stats.rows} rows in {stats.elapsed:.1f}s ({stats.rows_per_sec:.0f} rows/s), "
+          f"requests={stats.requests}, retries={stats.retries}, splits={stats.splits}")
+    if stats.failed_rows:
+        for err in stats.errors[:10]:
+            print(f"  ⚠️  {err}")
+        raise SystemExit(f"{stats.failed_rows} rows failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+"""
+期中（途中月）スナップショットの差分取り込み
+
+「第82期 2022.06-12 ランキング表(担当別)」のような途中月のファイルは、通期版と
+同じ行（同じ source_file）を上書きし合うため発見モードでは除外している。
+そのため今期の数字は期末まで取り込めなかった。ここでは途中月のファイルを
+スナップショットとして受け付け、前回取り込んだ内容との差分だけを書き込む。
+
+1. 抽出・パースは通常と同じ（出力は <output_dir>/snapshots に分けて置き、通期版のCSVは上書きしない）
+2. ラベルごとの台帳（snapshots/{label}.lineage.json）に前回の値を持っておき、
+   行（区分・得意先・担当・部門）ごと・月ごとに比較する
+   （今回ない行も DB には残るので、台帳にも stale として残し、再び現れたら UPDATE する）
+   --dsn 指定時は DB に入っている行を読み直して比較の基準にする（台帳と食い違えば警告）
+   - 前回の対象月より後の月 = 新しい月、前回までの月で値が変わったもの = 修正
+3. 変わった月の列（と順位・合計）だけを UPDATE、新しい行だけを INSERT する SQL を
+   sql_batches/{label}_snapshot_{連番}.sql に出力する（--dsn 指定時はそのまま適用する）
+4. 取り込みの履歴（元ファイル・ハッシュ・対象月数・新しい月・修正件数）を台帳と
+   customer_sales_ranking_snapshots に記録する
+
+初回（台帳なし）と、同じ行が複数ある場合は source_file 単位で入れ替える。
+通期版のファイルを渡すと、スナップショットの行をすべて入れ替えて台帳を確定済みにし、
+以後その期のスナップショットは受け付けない。
+--dsn を指定しない場合、出力した SQL は連番の順に適用すること。
+
+    python ranking_snapshot.py "第85期 2025.06-10 お客様ランキング表.pdf" --dsn postgresql://...
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+
+from generate_insert_sql import BATCH_SIZE, build_insert_sql, escape_sql
+from ranking_manifest import (
+    FISCAL_START_MONTH, STATE_FILENAME, file_digest, job_for_path, load_manifest, load_state, parse_filename,
+    save_state,
+)
+from ranking_pipeline import MONTH_KEYS, parse, validate
+
+try:
+    import psycopg
+except ImportError:
+    psycopg = None
+
+SNAPSHOT_DIRNAME = "snapshots"
+LINEAGE_TABLE = "customer_sales_ranking_snapshots"
+KEY_COLUMNS = ["period_type", "customer_name_raw", "sales_rep_name_raw", "department_name_raw"]
+STORED_COLUMNS = KEY_COLUMNS + ["rank", "total"] + MONTH_KEYS
+
+MODE_REPLACE = "replace"
+MODE_DELTA = "delta"
+MODE_FINAL = "final"
+
+
+def fiscal_month_keys(months=12):
+    """期首から months か月分の月列（06月始まりなら month_06, month_07, ...）"""
+    return [f"month_{(FISCAL_START_MONTH - 1 + i) % 12 + 1:02d}" for i in range(months)]
+
+
+def row_key(record):
+    return "\t".join(record.get(c) or "" for c in KEY_COLUMNS)
+
+
+def source_file(job):
+    """DB 上の source_file（通期版と同じ名前にして、通期版のロードで置き換わるようにする）"""
+    return f"{job.label}_import.csv"
+
+
+# =============================
+# 台帳
+# =============================
+def ledger_path(output_dir, label):
+    return Path(output_dir) / SNAPSHOT_DIRNAME / f"{label}.lineage.json"
+
+
+def load_ledger(output_dir, label):
+    return load_state(ledger_path(output_dir, label))
+
+
+def ledger_rows(records, previous=None):
+    """
+    台帳に持つ行の値。previous（前回の台帳の行）を渡すと、今回ない行も stale として残す
+    （差分取り込みでは DB から消さないので、再び現れたときに INSERT せず UPDATE するため）。
+    """
+    rows = {key: {**row, "stale": True} for key, row in (previous or {}).items()}
+    rows.update({row_key(r): {"rank": r.get("rank"), "total": r.get("total", 0),
+                              "months": [r.get(k, 0) for k in MONTH_KEYS]}
+                 for r in records})
+    return rows
+
+
+def _number(value):
+    """numeric 列の値（Decimal）を台帳・レコードと同じ int にそろえる"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+def fetch_stored_rows(conn, job, table):
+    """DB に入っているこの期・source_file の行（適用まで行ロックを取る）"""
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT {', '.join(STORED_COLUMNS)} FROM {table} "
+                    f"WHERE fiscal_period_id = %s AND source_file = %s FOR UPDATE",
+                    (job.fiscal_period_id, source_file(job)))
+        return [{c: _number(v) for c, v in zip(STORED_COLUMNS, row)} for row in cur.fetchall()]
+
+
+def reconcile_ledger(ledger, stored):
+    """
+    DB の行を差分の基準にした台帳を返す。台帳と食い違う行があれば件数を警告する。
+    同じ行が DB に複数ある場合は duplicates を立てる（入れ替えで直す）。
+    """
+    rows = ledger_rows(stored)
+    previous = {key: {k: v for k, v in row.items() if k != "stale"}
+                for key, row in ledger.get("rows", {}).items()}
+    only_ledger = len(set(previous) - set(rows))
+    only_db = len(set(rows) - set(previous))
+    differ = sum(1 for key in set(rows) & set(previous) if rows[key] != previous[key])
+    if only_ledger or only_db or differ:
+        print(f"     ⚠️  台帳と DB が一致しません（台帳のみ {only_ledger} / DB のみ {only_db} / "
+              f"値違い {differ} 行）。DB の値を基準にします")
+    return {**ledger, "rows": rows, "duplicates": has_duplicate_keys(stored)}
+
+
+# =============================
+# 差分
+# =============================
+def diff_records(records, ledger):
+    """
+    前回の台帳と比べた差分。
+    戻り値: {"inserts": [...], "updates": {(列,...): [レコード, ...]}, "new_months": [...],
+             "revised": {月列: 件数}, "unchanged": n, "missing": n, "cells": n}
+    """
+    previous = ledger.get("rows", {})
+    covered = set(fiscal_month_keys(ledger.get("months", 0)))
+    inserts, updates = [], {}
+    new_months, revised = set(), {}
+    unchanged = cells = 0
+    seen = set()
+    for r in records:
+        key = row_key(r)
+        seen.add(key)
+        prev = previous.get(key)
+        if prev is None:
+            inserts.append(r)
+            continue
+        changed = [k for k, old in zip(MONTH_KEYS, prev["months"]) if r.get(k, 0) != old]
+        for k in changed:
+            if k in covered:
+                revised[k] = revised.get(k, 0) + 1
+            else:
+                new_months.add(k)
+        columns = list(changed)
+        if r.get("rank") != prev["rank"]:
+            columns.insert(0, "rank")
+        if changed or r.get("total", 0) != prev["total"]:
+            columns.append("total")
+        if not columns:
+            unchanged += 1
+            continue
+        cells += len(changed)
+        updates.setdefault(tuple(columns), []).append(r)
+    return {
+        "inserts": inserts,
+        "updates": updates,
+        "new_months": [k for k in fiscal_month_keys() if k in new_months],
+        "revised": revised,
+        "unchanged": unchanged,
+        "missing": len(set(previous) - seen),
+        "cells": cells,
+    }
+
+
+def has_duplicate_keys(records):
+    keys = [row_key(r) for r in records]
+    return len(set(keys)) != len(keys)
+
+
+# =============================
+# SQL
+# =============================
+def _period_filter(job, alias=""):
+    prefix = f"{alias}." if alias else ""
+    return (f"{prefix}fiscal_period_id = {escape_sql(job.fiscal_period_id)} "
+            f"AND {prefix}source_file = {escape_sql(source_file(job))}")
+
+
+def build_update_sql(job, columns, batch, table):
+    """同じ列が変わった行をまとめて UPDATE ... FROM (VALUES ...) にする"""
+    names = KEY_COLUMNS + list(columns)
+    values = ",\n".join("(" + ", ".join(escape_sql(r.get(c)) for c in names) + ")" for r in batch)
+    assignments = ", ".join(f"{c} = v.{c}" for c in columns)
+    return f"""
+UPDATE {table} AS t SET {assignments}, updated_at = timezone('utc'::text, now())
+FROM (VALUES
+{values}
+) AS v({", ".join(names)})
+WHERE {_period_filter(job, "t")}
+  AND t.period_type = v.period_type
+  AND t.customer_name_raw = v.customer_name_raw
+  AND t.sales_rep_name_raw IS NOT DISTINCT FROM v.sales_rep_name_raw
+  AND t.department_name_raw IS NOT DISTINCT FROM v.department_name_raw;
+"""
+
+
+def build_lineage_sql(job, entry, mode):
+    statements = []
+    if mode == MODE_FINAL:
+        statements.append(f"UPDATE {LINEAGE_TABLE} SET superseded_at = timezone('utc'::text, now()) "
+                          f"WHERE {_period_filter(job)} AND superseded_at IS NULL;\n")
+    new_months = "ARRAY[" + ", ".join(escape_sql(k) for k in entry["new_months"]) + "]::text[]"
+    statements.append(
+        f"INSERT INTO {LINEAGE_TABLE} (fiscal_period_id, source_file, snapshot_file, sha256, previous_sha256, "
+        f"months, mode, new_months, revised_cells, inserted, updated) VALUES ("
+        f"{escape_sql(job.fiscal_period_id)}, {escape_sql(source_file(job))}, {escape_sql(entry['source'])}, "
+        f"{escape_sql(entry['sha256'])}, {escape_sql(entry['previous_sha256'])}, {entry['months']}, "
+        f"{escape_sql(mode)}, {new_months}, {sum(entry['revised'].values())}, "
+        f"{entry['inserted']}, {entry['updated']});\n")
+    return statements
+
+
+def build_statements(job, records, delta, mode, table, batch_size=BATCH_SIZE):
+    statements = []
+    if mode in (MODE_REPLACE, MODE_FINAL):
+        statements.append(f"DELETE FROM {table} WHERE {_period_filter(job)};\n")
+        inserts = records
+    else:
+        inserts = delta["inserts"]
+        for columns, rows in delta["updates"].items():
+            for i in range(0, len(rows), batch_size):
+                statements.append(build_update_sql(job, columns, rows[i:i + batch_size], table))
+    for i in range(0, len(inserts), batch_size):
+        statements.append(build_insert_sql(inserts[i:i + batch_size], table))
+    return statements
+
+
+def write_sql(statements, path, table):
+    from ranking_query import refresh_sql
+
+    os.makedirs(path.parent, exist_ok=True)
+    tmp = path.with_suffix(".sql.tmp")
+    with open(tmp, "w", encoding="utf-8") as out:
+        out.write("BEGIN;\n")
+        out.writelines(statements)
+        out.write("COMMIT;\n")
+        out.write(refresh_sql(table))
+    os.replace(tmp, path)
+    return path
+
+
+def connect(dsn, table):
+    from ranking_query import check_rollup_source
+
+    check_rollup_source(table)
+    if psycopg is None:
+        raise RuntimeError("psycopg がインストールされていません (pip install 'psycopg[binary]')")
+    return psycopg.connect(dsn)
+
+
+def apply_sql(conn, statements):
+    """基準の行を読んだのと同じトランザクションで適用し、集計ビューを更新する"""
+    from ranking_query import refresh_rollups
+
+    with conn.cursor() as cur:
+        for statement in statements:
+            cur.execute(statement)
+    conn.commit()
+    refresh_rollups(conn)
+
+
+# =============================
+# 1ファイル取り込み
+# =============================
+def _skip(job, reason):
+    print(f"  ⏭️  [{job.label}] {job.source.name}: {reason}")
+    return {"label": job.label, "source": job.source.name, "status": "skipped", "reason": reason}
+
+
+def _loaded_as_full_year(job, state):
+    """通常の extract で通期版を取り込み済みか（.ranking_state.json の記録から）"""
+    previous = state.get(job.label)
+    if not previous:
+        return False
+    info = parse_filename(previous.get("source", "")) or {}
+    return info.get("months", 12) >= 12
+
+
+def ingest_snapshot(job, output_dir, table, dsn=None, force=False, ocr=None, confidence=None):
+    """
+    1ファイル分のスナップショットを取り込み、結果の dict を返す。
+    通期版（12か月）のファイルなら、スナップショットの行を入れ替えて確定する。
+    """
+    from process_rankings import process_one
+
+    if not job.fiscal_period_id:
+        return _skip(job, "fiscal_period_id が未設定です")
+    if dsn:
+        # 抽出を始める前に投入先を確かめる
+        from ranking_query import check_rollup_source
+
+        check_rollup_source(table)
+    ledger = load_ledger(output_dir, job.label)
+    lineage = ledger.get("lineage", [])
+    digest = file_digest(job.source)
+
+    if not force:
+        if ledger.get("final"):
+            return _skip(job, "通期版で確定済みです")
+        state = load_state(Path(output_dir) / STATE_FILENAME)
+        if not job.is_full_year and not ledger and _loaded_as_full_year(job, state):
+            return _skip(job, "通期版を取り込み済みです（--force で上書き）")
+        if lineage and lineage[-1]["sha256"] == digest:
+            return _skip(job, "前回から変更がありません")
+        if job.months < ledger.get("months", 0):
+            return _skip(job, f"前回（{ledger['months']} か月）より古いスナップショットです")
+
+    snapshot_dir = Path(output_dir) / SNAPSHOT_DIRNAME
+    os.makedirs(snapshot_dir, exist_ok=True)
+    if not process_one(job.label, job.source, snapshot_dir, job.fiscal_period_id, ocr, confidence):
+        return {"label": job.label, "source": job.source.name, "status": "failed", "reason": "抽出結果が0行です"}
+    records = parse(snapshot_dir / "supabase_import" / source_file(job), job.months)
+    errors, _ = validate(records)
+    if errors:
+        return {"label": job.label, "source": job.source.name, "status": "rejected", "errors": errors}
+
+    conn = connect(dsn, table) if dsn else None
+    try:
+        baseline = ledger
+        if conn is not None and ledger:
+            baseline = reconcile_ledger(ledger, fetch_stored_rows(conn, job, table))
+        if job.is_full_year:
+            mode = MODE_FINAL
+        elif (not ledger or ledger.get("fiscal_period_id") != job.fiscal_period_id
+              or has_duplicate_keys(records) or not baseline.get("rows") or baseline.get("duplicates")):
+            mode = MODE_REPLACE
+        else:
+            mode = MODE_DELTA
+        delta = diff_records(records, baseline if mode == MODE_DELTA else {})
+        updated = sum(len(rows) for rows in delta["updates"].values())
+
+        entry = {
+            "seq": len(lineage) + 1,
+            "source": job.source.name,
+            "sha256": digest,
+            "previous_sha256": lineage[-1]["sha256"] if lineage else None,
+            "months": job.months,
+            "mode": mode,
+            "new_months": delta["new_months"] if mode == MODE_DELTA else fiscal_month_keys(job.months),
+            "revised": delta["revised"],
+            "inserted": len(records) if mode != MODE_DELTA else len(delta["inserts"]),
+            "updated": updated,
+            "unchanged": delta["unchanged"],
+            "missing": delta["missing"],
+        }
+        statements = build_statements(job, records, delta, mode, table) + build_lineage_sql(job, entry, mode)
+        sql_path = write_sql(statements,
+                             Path(output_dir) / "sql_batches" / f"{job.label}_snapshot_{entry['seq']:03d}.sql", table)
+        if conn is not None:
+            apply_sql(conn, statements)
+    finally:
+        if conn is not None:
+            conn.close()
+    entry.update(sql=str(sql_path), applied=bool(dsn), created_at=datetime.now(timezone.utc).isoformat())
+
+    save_state(ledger_path(output_dir, job.label), {
+        "label": job.label,
+        "fiscal_period_id": job.fiscal_period_id,
+        "source_file": source_file(job),
+        "months": job.months,
+        "final": mode == MODE_FINAL,
+        "lineage": lineage + [entry],
+        "rows": ledger_rows(records, baseline.get("rows") if mode == MODE_DELTA else None),
+    })
+
+    if mode == MODE_DELTA:
+        revised = ", ".join(f"{k[-2:]}月 {n}" for k, n in delta["revised"].items()) or "なし"
+        new_months = ", ".join(f"{k[-2:]}月" for k in delta["new_months"]) or "なし"
+        print(f"     → 差分: 新しい月 {new_months} / 修正 {revised} / "
+              f"挿入 {len(delta['inserts'])} ・更新 {updated} ・変更なし {delta['unchanged']} 行（全 {len(records)} 行）")
+        if delta["missing"]:
+            print(f"     ⚠️  前回あって今回ない行が {delta['missing']} 件あります（DB上はそのまま残し、台帳には stale として残します）")
+    else:
+        label = "通期版で確定" if mode == MODE_FINAL else "入れ替え"
+        print(f"     → {label}: {len(records)} 行")
+    print(f"        SQL: {sql_path.name}{'（適用済み）' if dsn else ''}")
+    return {"label": job.label, "source": job.source.name, "status": "ok", **entry}
+
+
+def ingest_files(paths, manifest, dsn=None, force=False, ocr=None, confidence=None):
+    """複数ファイルは期・レイアウトごとに対象月数の短い順（古い順）に取り込む"""
+    jobs = []
+    for path in paths:
+        path = Path(path)
+        if not path.exists():
+            print(f"  ❌ 見つかりません: {path}")
+            continue
+        job = job_for_path(path, manifest)
+        if job is not None:
+            jobs.append(job)
+    jobs.sort(key=lambda j: (j.label, j.months, j.source.stat().st_mtime_ns))
+    return [ingest_snapshot(job, manifest.output_dir, manifest.table, dsn, force, ocr, confidence)
+            for job in jobs]
+
+
+def parse_args(argv=None):
+    from process_rankings import add_extraction_arguments
+
+    parser = argparse.ArgumentParser(description="期中スナップショットの差分取り込み")
+    parser.add_argument("files", nargs="+", help="スナップショットのPDF（通期版を渡すと確定する）")
+    parser.add_argument("--manifest", help="ジョブマニフェスト (既定: ranking_jobs.json)")
+    parser.add_argument("--output-dir", help="CSV出力先（マニフェストの値を上書き）")
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL"),
+                        help="指定するとSQLを出力したうえでそのまま適用する")
+    parser.add_argument("--force", action="store_true", help="古い・変更のないスナップショットも取り込む")
+    add_extraction_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    from process_rankings import extraction_confidence, ocr_config
+
+    args = parse_args(argv)
+    manifest = load_manifest(args.manifest, output_dir=args.output_dir)
+    results = ingest_files(args.files, manifest, args.dsn, args.force,
+                           ocr_config(args, manifest.output_dir), extraction_confidence(args))
+    return 0 if results and all(r["status"] in ("ok", "skipped") for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+"""
+ランキング表の監視取り込みデーモン
+
+共有フォルダに置かれた PDF を監視し、書き込みが落ち着いた（サイズ・更新時刻が
+一定時間変化しない）ファイルだけを有限のワーカープールに投入して
+extract → parse → validate → load を1ファイル単位で実行する。
+結果は出力先の ingest_status.jsonl に1行ずつ記録する。
+
+ロードまで済んだファイルは .ingest_state.json に記録する（rankings.py extract の
+.ranking_state.json は「抽出済み」の記録なので共有しない）。
+
+監視には inotify_simple（Linux）があれば inotify を使い、なければポーリングする。
+
+    python ranking_watch.py --watch-dir /srv/rankings/inbox --workers 2
+"""
+import argparse
+import os
+import signal
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from ranking_manifest import ignore_sigint, job_for_path, load_manifest, load_state, plan_jobs, update_state
+from ranking_pipeline import append_status, run_job
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:  # Linux 以外・未インストール時はポーリング
+    INotify = None
+
+
+# =============================
+# ファイル変更の検知
+# =============================
+class PollingWatcher:
+    """一定間隔でフォルダを走査し、サイズか更新時刻が変わった PDF を返す"""
+
+    def __init__(self, folder):
+        self.folder = Path(folder)
+        self.seen = {}
+
+    def changed(self, timeout):
+        time.sleep(timeout)
+        paths = []
+        current = {}
+        for path in self.folder.glob("*.pdf"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            sig = (st.st_size, st.st_mtime_ns)
+            current[path] = sig
+            if self.seen.get(path) != sig:
+                paths.append(path)
+        self.seen = current
+        return paths
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """inotify で書き込み完了・移動・作成イベントを受け取る"""
+
+    def __init__(self, folder):
+        self.folder = Path(folder)
+        self.inotify = INotify()
+        mask = (inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO
+                | inotify_flags.CREATE | inotify_flags.MODIFY)
+        self.inotify.add_watch(str(self.folder), mask)
+        # 起動前から置かれているファイルも一度だけ対象にする
+        self.initial = sorted(self.folder.glob("*.pdf"))
+
+    def changed(self, timeout):
+        if self.initial:
+            paths, self.initial = self.initial, []
+            return paths
+        events = self.inotify.read(timeout=int(timeout * 1000))
+        return [self.folder / e.name for e in events if e.name.lower().endswith(".pdf")]
+
+    def close(self):
+        self.inotify.close()
+
+
+def make_watcher(folder, force_poll=False):
+    if INotify is not None and not force_poll:
+        return InotifyWatcher(folder)
+    return PollingWatcher(folder)
+
+
+class Debouncer:
+    """
+    書き込み途中のファイルを除外する。
+    最後にサイズ・更新時刻が変化してから settle 秒経過したファイルだけを ready とする。
+    """
+
+    def __init__(self, settle):
+        self.settle = settle
+        self.pending = {}
+
+    def touch(self, path, now):
+        self.pending.setdefault(Path(path), (None, now))
+
+    def ready(self, now):
+        result = []
+        for path, (sig, since) in list(self.pending.items()):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                del self.pending[path]
+                continue
+            current = (st.st_size, st.st_mtime_ns)
+            if current != sig:
+                self.pending[path] = (current, now)
+            elif st.st_size > 0 and now - since >= self.settle:
+                del self.pending[path]
+                result.append(path)
+        return result
+
+
+# =============================
+# デーモン本体
+# =============================
+class IngestDaemon:
+    def __init__(self, manifest, watch_dir, workers=2, queue_size=8, settle=5.0,
+                 interval=1.0, include_partial=False, force_poll=False):
+        self.manifest = manifest
+        self.output_dir = manifest.output_dir
+        self.watch_dir = Path(watch_dir)
+        self.workers = workers
+        self.queue = deque()
+        self.queue_size = queue_size
+        self.debouncer = Debouncer(settle)
+        self.interval = interval
+        self.include_partial = include_partial
+        self.force_poll = force_poll
+        self.running = {}
+        self.stopping = False
+
+    def stop(self, *_):
+        self.stopping = True
+
+    def enqueue(self, path):
+        """ready になったファイルをジョブ化してキューへ。キューが満杯なら次回に回す"""
+        if len(self.queue) >= self.queue_size:
+            self.debouncer.touch(path, time.monotonic())
+            return
+        job = job_for_path(path, self.manifest)
+        if job is None:
+            return
+        if not job.is_full_year and not self.include_partial:
+            print(f"  ⏭️  途中月のファイルのためスキップ: {path.name}")
+            return
+        if job.label in self.running or any(j.label == job.label for j, _ in self.queue):
+            # 処理中に更新された場合は終わってから再投入する
+            self.debouncer.touch(path, time.monotonic())
+            return
+
+        state = load_state(self.manifest.ingest_state_path)
+        planned, fingerprints = plan_jobs([job], state, self.output_dir)
+        if planned:
+            self.queue.append((job, fingerprints[job.label]))
+            print(f"  📥 キュー追加: [{job.label}] {path.name}")
+
+    def dispatch(self, pool):
+        while self.queue and len(self.running) < self.workers:
+            job, fp = self.queue.popleft()
+            future = pool.submit(run_job, job, self.output_dir, self.manifest.table)
+            self.running[job.label] = (job, fp, future)
+
+    def collect(self):
+        for label, (job, fp, future) in list(self.running.items()):
+            if not future.done():
+                continue
+            del self.running[label]
+            try:
+                status = future.result()
+            except Exception as e:  # ワーカープロセス自体の異常終了
+                status = {"label": label, "source": job.source.name, "status": "failed", "error": str(e)}
+            append_status(self.output_dir, status)
+            if status.get("status") == "ok":
+                update_state(self.manifest.ingest_state_path, {label: fp})
+                print(f"  ✅ [{label}] {status.get('records', 0)} 件")
+            else:
+                print(f"  ❌ [{label}] {status.get('status')}: {status.get('error') or status.get('errors')}")
+
+    def run(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        watcher = make_watcher(self.watch_dir, self.force_poll)
+        print(f"👀 監視開始: {self.watch_dir} ({type(watcher).__name__}, workers={self.workers})")
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=ignore_sigint) as pool:
+                while not self.stopping:
+                    now = time.monotonic()
+                    for path in watcher.changed(self.interval):
+                        self.debouncer.touch(path, now)
+                    for path in self.debouncer.ready(time.monotonic()):
+                        self.enqueue(path)
+                    self.dispatch(pool)
+                    self.collect()
+
+                print("🛑 停止中… 実行中のジョブの完了を待ちます")
+                for _, _, future in self.running.values():
+                    future.exception()
+                self.collect()
+        finally:
+            watcher.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="ランキング表PDFの監視取り込み")
+    parser.add_argument("--manifest", help="ジョブマニフェスト (既定: ranking_jobs.json)")
+    parser.add_argument("--watch-dir", help="監視フォルダ (既定: マニフェストの source_dir)")
+    parser.add_argument("--output-dir", help="出力先（マニフェストの値を上書き）")
+    parser.add_argument("--workers", type=int, default=2, help="同時に処理するファイル数")
+    parser.add_argument("--queue-size", type=int, default=8, help="待ち行列の上限")
+    parser.add_argument("--settle", type=float, default=5.0,
+                        help="この秒数サイズ・更新時刻が変わらなければ書き込み完了とみなす")
+    parser.add_argument("--interval", type=float, default=1.0, help="監視間隔（秒）")
+    parser.add_argument("--poll", action="store_true", help="inotify を使わずポーリングする")
+    parser.add_argument("--include-partial", action="store_true", help="途中月のファイルも取り込む")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    manifest = load_manifest(args.manifest, output_dir=args.output_dir)
+    daemon = IngestDaemon(
+        manifest,
+        args.watch_dir or manifest.source_dir,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        settle=args.settle,
+        interval=args.interval,
+        include_partial=args.include_partial,
+        force_poll=args.poll,
+    )
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    daemon.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+ランキング表取り込みの統合CLI
+
+    python rankings.py extract   PDF → CSV（新規・変更分のみ）
+    python rankings.py parse     CSV → rankings_to_insert.json
+    python rankings.py validate  レコードの整合性チェック
+    python rankings.py load      SQLバッチ出力 / --rest で Supabase REST へ投入 /
+                                 --partition で期単位のパーティション差し替え
+    python rankings.py run       extract → parse → validate → load
+    python rankings.py compare   エントリパーサーの出力差分・処理時間を比較
+    python rankings.py preview   PDFの一部ページだけを抽出・パースして全体のコストを見積もる
+    python rankings.py snapshot  途中月のファイルを取り込み、前回から変わった月の列だけを書き込む
+
+--manifest / --source-dir / --output-dir は全サブコマンド共通。
+pdfplumber や httpx など重い依存は、それを使うサブコマンドの中でだけ import する
+（parse / validate は PDF ライブラリを読み込まずに起動する）。
+"""
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+from process_rankings import add_extraction_arguments
+from ranking_adaptive import DEFAULT_CONFIDENCE
+from ranking_manifest import load_manifest
+
+DEFAULT_RECORDS = Path(__file__).with_name("rankings_to_insert.json")
+DEFAULT_SQL_DIR = Path(__file__).with_name("sql_batches")
+
+
+def read_records(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    print(f"Saved to {path}")
+
+
+# =============================
+# サブコマンド
+# =============================
+def cmd_extract(args, manifest):
+    from process_rankings import extract_jobs, extraction_confidence, ocr_config, select_jobs
+
+    jobs = select_jobs(manifest, args.discover, args.include_partial)
+    extract_jobs(manifest, jobs, args.jobs, args.force,
+                 ocr_config(args, manifest.output_dir), extraction_confidence(args))
+    return 0
+
+
+def cmd_parse(args, manifest):
+    from import_rankings_to_supabase import parse_files, write_records
+
+    records = parse_files(args.input_dir or manifest.import_dir, args.jobs)
+    write_records(args.records, records)
+    return 0
+
+
+def cmd_validate(args, manifest, records=None):
+    from ranking_pipeline import validate
+
+    if records is None:
+        records = read_records(args.records)
+
+    by_source = {}
+    for r in records:
+        by_source.setdefault(r.get("source_file") or "(不明)", []).append(r)
+
+    failed = 0
+    for source, recs in sorted(by_source.items()):
+        errors, warnings = validate(recs)
+        flagged = {k: v for k, v in warnings.items() if v}
+        mark = "❌" if errors else ("⚠️ " if flagged else "✅")
+        detail = f" {flagged}" if flagged else ""
+        print(f"  {mark} {source}: {len(recs)} 件{detail}")
+        for e in errors:
+            print(f"       {e}")
+        failed += bool(errors)
+
+    if not records:
+        print("  ❌ レコードが0件です")
+        return 1
+    return 1 if failed else 0
+
+
+def read_parse_manifest(records_path):
+    from import_rankings_to_supabase import parse_manifest_path
+
+    path = parse_manifest_path(records_path)
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def cmd_load(args, manifest, records=None):
+    if records is None:
+        records = read_records(args.records)
+
+    if args.rest:
+        import asyncio
+
+        from ranking_rest_loader import RestLoader
+
+        if not args.url or not args.key:
+            print("SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY（または --url / --key）を指定してください")
+            return 2
+        if args.refresh:
+            from ranking_query import check_rollup_source
+
+            try:
+                check_rollup_source(manifest.table)
+            except ValueError as e:
+                print(f"{e}（--no-refresh で更新せずに投入できます）")
+                return 2
+        loader = RestLoader(args.url, args.key, manifest.table,
+                            concurrency=args.concurrency, batch_size=args.batch_size)
+        stats = asyncio.run(loader.load(records, replace=args.replace, refresh=args.refresh))
+        print(f"Loaded {stats.rows} rows in {stats.elapsed:.1f}s "
+              f"(requests={stats.requests}, retries={stats.retries})")
+        return 1 if stats.failed_rows else 0
+
+    if args.partition:
+        from ranking_partition_load import load_periods
+
+        if not args.dsn:
+            print("DATABASE_URL（または --dsn）を指定してください")
+            return 2
+        # 件数照合には parse が書き出した件数表を使う（run では直前の write_records が書いたもの）
+        parse_manifest = read_parse_manifest(args.records)
+        if parse_manifest is None:
+            print(f"パースマニフェストがありません（{args.records} と同じ場所に parse で作成してください）")
+            return 2
+        load_periods(args.dsn, records, parse_manifest, args.period, table=manifest.table)
+        return 0
+
+    from generate_insert_sql import write_batches
+
+    write_batches(records, args.sql_dir, manifest.table, args.batch_size)
+    return 0
+
+
+def cmd_run(args, manifest):
+    from import_rankings_to_supabase import parse_files, write_records
+    from process_rankings import extract_jobs, extraction_confidence, ocr_config, select_jobs
+
+    jobs = select_jobs(manifest, args.discover, args.include_partial)
+    extract_jobs(manifest, jobs, args.jobs, args.force,
+                 ocr_config(args, manifest.output_dir), extraction_confidence(args))
+
+    records = parse_files(manifest.import_dir, args.jobs)
+    write_records(args.records, records)
+
+    if cmd_validate(args, manifest, records) and not args.ignore_errors:
+        print("❌ 検証エラーがあるためロードを中止しました（--ignore-errors で続行）")
+        return 1
+    return cmd_load(args, manifest, records)
+
+
+def cmd_compare(args, manifest):
+    import glob
+
+    from ranking_parser_diff import print_summary, run_corpus
+
+    files = args.files or glob.glob(os.path.join(args.input_dir or manifest.import_dir, "*_import.csv"))
+    parsers = args.parsers.split(",") if args.parsers else None
+    summary = run_corpus(files, parsers, args.jobs, args.repeat)
+    print_summary(summary)
+    if args.report:
+        write_json(args.report, summary)
+    return 0
+
+
+def cmd_preview(args, manifest):
+    from process_rankings import extraction_confidence
+    from ranking_preview import is_usable, preview_files
+
+    reports = preview_files(args.files, manifest, args.samples, extraction_confidence(args))
+    if args.report:
+        write_json(args.report, reports)
+    return 0 if reports and all(is_usable(r) for r in reports) else 1
+
+
+def cmd_snapshot(args, manifest):
+    from process_rankings import extraction_confidence, ocr_config
+    from ranking_snapshot import ingest_files
+
+    results = ingest_files(args.files, manifest, args.dsn, args.force,
+                           ocr_config(args, manifest.output_dir), extraction_confidence(args))
+    return 0 if results and all(r["status"] in ("ok", "skipped") for r in results) else 1
+
+
+# =============================
+# 引数
+# =============================
+def build_parser():
+    parser = argparse.ArgumentParser(prog="rankings", description="ランキング表取り込み")
+    parser.add_argument("--manifest", help="ジョブマニフェスト (既定: ranking_jobs.json)")
+    parser.add_argument("--source-dir", help="入力PDFフォルダ（マニフェストの値を上書き）")
+    parser.add_argument("--output-dir", help="CSV出力先（マニフェストの値を上書き）")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    jobs = argparse.ArgumentParser(add_help=False)
+    jobs.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="並列プロセス数")
+
+    records = argparse.ArgumentParser(add_help=False)
+    records.add_argument("--records", default=str(DEFAULT_RECORDS), help="レコードJSON")
+
+    extract = argparse.ArgumentParser(add_help=False)
+    extract.add_argument("--discover", nargs="?", const="", metavar="DIR",
+                         help="フォルダを走査してファイル名から期・レイアウトを推定する")
+    extract.add_argument("--include-partial", action="store_true", help="途中月のファイルも対象にする")
+    extract.add_argument("--force", action="store_true", help="変更がなくても全件処理する")
+    add_extraction_arguments(extract)
+
+    load = argparse.ArgumentParser(add_help=False)
+    load.add_argument("--sql-dir", default=str(DEFAULT_SQL_DIR), help="SQLバッチ出力先")
+    load.add_argument("--batch-size", type=int, default=2000)
+    load.add_argument("--rest", action="store_true", help="SQLを出力せず Supabase REST へ直接投入する")
+    load.add_argument("--url", default=os.environ.get("SUPABASE_URL"))
+    load.add_argument("--key", default=os.environ.get("SUPABASE_SERVICE_ROLE_KEY"))
+    load.add_argument("--concurrency", type=int, default=4, help="REST投入の同時リクエスト数")
+    load.add_argument("--replace", action="store_true", help="REST投入前に同じ source_file の行を削除する")
+    load.add_argument("--no-refresh", dest="refresh", action="store_false",
+                      help="REST投入後に集計ビューを更新しない（既定では更新する）")
+    load.add_argument("--partition", action="store_true",
+                      help="期単位でステージングへ一括ロードし、パーティションを差し替える")
+    load.add_argument("--dsn", default=os.environ.get("DATABASE_URL"), help="PostgreSQL 接続文字列")
+    load.add_argument("--period", action="append", help="差し替える fiscal_period_id（複数指定可、既定: 全期）")
+
+    p = sub.add_parser("extract", parents=[jobs, extract], help="PDF → CSV")
+    p.set_defaults(func=cmd_extract)
+
+    p = sub.add_parser("parse", parents=[jobs, records], help="CSV → レコードJSON")
+    p.add_argument("--input-dir", help="入力CSVフォルダ (既定: <output_dir>/supabase_import)")
+    p.set_defaults(func=cmd_parse)
+
+    p = sub.add_parser("validate", parents=[records], help="レコードの整合性チェック")
+    p.set_defaults(func=cmd_validate)
+
+    p = sub.add_parser("load", parents=[records, load], help="SQL出力 / REST投入")
+    p.set_defaults(func=cmd_load)
+
+    p = sub.add_parser("run", parents=[jobs, records, extract, load], help="全工程を実行")
+    p.add_argument("--ignore-errors", action="store_true", help="検証エラーがあってもロードする")
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser("compare", parents=[jobs], help="パーサーの差分比較")
+    p.add_argument("files", nargs="*", help="比較する import用CSV（省略時は --input-dir 内すべて）")
+    p.add_argument("--input-dir", help="入力CSVフォルダ (既定: <output_dir>/supabase_import)")
+    p.add_argument("--parsers", help="比較するパーサー（カンマ区切り、既定: 登録済みすべて）")
+    p.add_argument("--repeat", type=int, default=1, help="計時のためにエントリごとに繰り返す回数")
+    p.add_argument("--report", help="結果をJSONで保存するパス")
+    p.set_defaults(func=cmd_compare)
+
+    p = sub.add_parser("preview", help="抜き取りページでのプレビューと全体見積もり")
+    p.add_argument("files", nargs="+", help="プレビューするPDF")
+    p.add_argument("--samples", type=int, default=3, help="抜き取るページ数（先頭・末尾を含む）")
+    p.add_argument("--report", help="結果をJSONで保存するパス")
+    p.add_argument("--full-tables", action="store_true", help="全ページで表検出を行う")
+    p.add_argument("--confidence", type=float, default=DEFAULT_CONFIDENCE,
+                   help="高速パスの結果を採用する信頼度の下限")
+    p.set_defaults(func=cmd_preview)
+
+    p = sub.add_parser("snapshot", help="期中スナップショットの差分取り込み")
+    p.add_argument("files", nargs="+", help="スナップショットのPDF（通期版を渡すと確定する）")
+    p.add_argument("--dsn", default=os.environ.get("DATABASE_URL"),
+                   help="指定するとSQLを出力したうえでそのまま適用する")
+    p.add_argument("--force", action="store_true", help="古い・変更のないスナップショットも取り込む")
+    add_extraction_arguments(p)
+    p.set_defaults(func=cmd_snapshot)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    manifest = load_manifest(args.manifest, args.source_dir, args.output_dir)
+    return args.func(args, manifest)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
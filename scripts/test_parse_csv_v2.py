@@ -4,9 +4,6 @@ import sys
 import io
 from pathlib import Path
 
-# Force UTF-8 output
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-
 csv_path = r"C:\Users\ishij\Downloads\ランキング表-20260219T030449Z-1-001\ランキング表\csv出力\supabase_import\第83期_順位_import.csv"
 
 def extract_values_from_line(line_str):
@@ -367,4 +364,7 @@ def parse_csv(file_path):
         print_result(r)
 
 if __name__ == "__main__":
+    # Force UTF-8 output
+    # (import 時に差し替えると parse_entry_lines を他から使えないため、直接実行時のみ)
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
     parse_csv(csv_path)
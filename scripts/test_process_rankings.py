@@ -0,0 +1,107 @@
+import csv
+
+from types import SimpleNamespace
+
+from process_rankings import (COMBINED_FILENAME, SHARD_META_ROWS, VALUE_START, create_combined,
+                              extract_page_rows, shard_path, split_text_line, text_to_rows)
+
+
+def test_text_to_rows_merges_previous_period_line():
+    text = """順位 得意先名 担当 06月 合計
+1 株式会社A 山田 営業部 今期 1,000 2,000 3,000
+前期 900 1,800 2,700
+2 株式会社B 今期 500 500
+
+以上
+"""
+    assert text_to_rows(text) == [
+        ["順位 得意先名 担当 06月 合計"],
+        ["1", "株式会社A", "山田", "営業部", "今期\n前期", "1,000\n900", "2,000\n1,800", "3,000\n2,700"],
+        ["2", "株式会社B", "", "", "今期", "500", "500"],
+        ["以上"],
+    ]
+
+
+def test_text_to_rows_does_not_merge_third_line():
+    rows = text_to_rows("1 株式会社A 今期 100\n前期 90\n80")
+    assert rows[0][VALUE_START:] == ["100\n90"]
+    # 2段目まで。それ以降の行はそのまま残す
+    assert rows[1] == ["80"]
+
+
+def test_split_text_line_ignores_page_numbers():
+    assert split_text_line("1 ページ 3") is None
+    assert split_text_line("2 株式会社B 今期 500") == ["2", "株式会社B", "", "", "今期", "500"]
+    assert split_text_line("3 株式会社C 400 400") == ["3", "株式会社C", "", "", "", "400", "400"]
+
+
+def test_text_page_keeps_lines_without_ocr_grammar():
+    # 文字情報のあるページは表が取れなくても行の文法では分けない（OCR のテキストだけ）
+    page = SimpleNamespace(extract_tables=lambda settings=None: [],
+                           extract_text=lambda: "1 ページ 3\n1 株式会社A 今期 100 100\n")
+    assert extract_page_rows(page) == [["1 ページ 3"], ["1 株式会社A 今期 100 100"]]
+
+
+def _write_shard(output_dir, label, rows):
+    path = shard_path(label, output_dir)
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow([f"{label}.pdf", "meta"])
+        writer.writerows([[]] * (SHARD_META_ROWS - 1))
+        writer.writerows(rows)
+    return path
+
+
+def _shards(output_dir):
+    _write_shard(output_dir, "第83期_順位", [["1", "株式会社A", "100"], ["2", "株式会社B", "90"]])
+    _write_shard(output_dir, "第84期_順位", [["1", "株式会社C", "200"]])
+    _write_shard(output_dir, "第85期_順位", [["1", "株式会社D", "50"]])
+
+
+def _revise(output_dir):
+    # 1期分だけ書き換え（サイズが変わる）、もう1期は削除。第83期はそのまま
+    _write_shard(output_dir, "第84期_順位", [["1", "株式会社C", "3000"]])
+    shard_path("第85期_順位", output_dir).unlink()
+
+
+def _full_build(output_dir, labels):
+    # 索引を使わずに作った結果（比較用）
+    index = output_dir / ".combined_index.json"
+    if index.exists():
+        index.unlink()
+    return create_combined(labels, output_dir).read_bytes()
+
+
+LABELS = ["第83期_順位", "第84期_順位", "第85期_順位"]
+
+
+def test_incremental_rebuild_matches_full_build(tmp_path):
+    fresh = tmp_path / "fresh"
+    fresh.mkdir()
+    _shards(tmp_path)
+    create_combined(LABELS, tmp_path)
+
+    _revise(tmp_path)
+    incremental = create_combined(LABELS, tmp_path).read_bytes()
+
+    _shards(fresh)
+    _revise(fresh)
+    assert incremental == _full_build(fresh, LABELS)
+    assert "3000".encode() in incremental and "株式会社D".encode() not in incremental
+
+
+def test_combined_follows_label_order(tmp_path):
+    _shards(tmp_path)
+    create_combined(LABELS, tmp_path)
+    reordered = create_combined(list(reversed(LABELS)), tmp_path).read_text(encoding="utf-8-sig")
+    sections = [line for line in reordered.splitlines() if line.startswith("===")]
+    assert sections == [f"=== {label} ===" for label in reversed(LABELS)]
+
+
+def test_combined_rebuilds_when_output_edited(tmp_path):
+    _shards(tmp_path)
+    out = create_combined(LABELS, tmp_path)
+    expected = out.read_bytes()
+    out.write_bytes(b"edited")
+    assert create_combined(LABELS, tmp_path).read_bytes() == expected
+    assert (tmp_path / COMBINED_FILENAME).read_bytes() == expected
@@ -0,0 +1,152 @@
+import pytest
+
+from ranking_adaptive import (TIER_FAST, TIER_SCANNED, TIER_TABLE, TIER_TEXT_TABLE, PageExtractor,
+                              fast_page_rows, score_rows)
+
+
+def _row(rank, months, previous=None):
+    values = [str(v) for v in months] + [str(sum(months))]
+    if previous:
+        values = [f"{v}\n{p}" for v, p in zip(values, [str(v) for v in previous] + [str(sum(previous))])]
+    return [str(rank), "株式会社A", "山田", "営業部", "今期\n前期" if previous else "今期"] + values
+
+
+MONTHS = [100] * 12
+
+
+def test_score_rows_all_entries_consistent():
+    rows = [["順位", "得意先名"], _row(1, MONTHS, [90] * 12), _row(2, MONTHS)]
+    assert score_rows(rows) == (1.0, 2)
+
+
+def test_score_rows_total_mismatch():
+    bad = _row(2, MONTHS)
+    bad[-1] = "1"
+    assert score_rows([_row(1, MONTHS), bad]) == (0.5, 2)
+
+
+def test_score_rows_rank_going_backwards():
+    # 順位が戻るのは列ずれの兆候（1 に戻るのは次の区分の先頭として許す）
+    rows = [_row(1, MONTHS), _row(3, MONTHS), _row(2, MONTHS), _row(1, MONTHS)]
+    assert score_rows(rows) == (0.75, 4)
+
+
+def test_score_rows_missing_month_cell():
+    assert score_rows([_row(1, MONTHS[:-1])]) == (0.0, 1)
+
+
+def test_score_rows_without_entries():
+    assert score_rows([["順位", "得意先名"], []]) == (None, 0)
+
+
+# =============================
+# 生成したPDFでの段の選択
+# =============================
+WIDTHS = [30, 110, 40, 40, 30] + [48] * 12 + [56]
+HEADER = ["順位", "得意先名", "担当", "部門", "区分"] + [f"{m:02d}月" for m in (6, 7, 8, 9, 10, 11, 12, 1, 2, 3, 4, 5)] + ["合計"]
+ROW_HEIGHT = 18
+
+
+def _table(start, count=6):
+    rows = [HEADER]
+    for rank in range(start, start + count):
+        months = [rank * 1000 + m * 37 for m in range(12)]
+        rows.append([str(rank), f"株式会社テスト{rank:03d}", "山田", "営業1", "今期"]
+                    + [f"{v:,}" for v in months] + [f"{sum(months):,}"])
+    return rows
+
+
+def _draw_table(c, rows, jitter=0.0, shift=None):
+    """
+    表を1ページ描く。数値は右寄せ。
+    jitter: 1行おきに内側の縦罫線をずらす / shift: {縦罫線の番号: ずらす量}
+    """
+    xs = [20]
+    for w in WIDTHS:
+        xs.append(xs[-1] + w)
+    ys = [780 - i * ROW_HEIGHT for i in range(len(rows) + 1)]
+    c.setFont("HeiseiKakuGo-W5", 7)
+    for r, row in enumerate(rows):
+        for col, text in enumerate(row):
+            if col >= 5:
+                c.drawRightString(xs[col + 1] - 3, ys[r] - 12, text)
+            else:
+                c.drawString(xs[col] + 3, ys[r] - 12, text)
+    c.setLineWidth(0.5)
+    for y in ys:
+        c.line(xs[0], y, xs[-1], y)
+    for r in range(len(rows)):
+        for i, x in enumerate(xs):
+            dx = 0.0
+            if 0 < i < len(xs) - 1:
+                dx = (jitter if r % 2 else 0.0) + (shift or {}).get(i, 0.0)
+            c.line(x + dx, ys[r], x + dx, ys[r + 1])
+    c.showPage()
+
+
+@pytest.fixture(scope="module")
+def ranking_pdf(tmp_path_factory):
+    """
+    1: 罫線どおりの表 / 2: 縦罫線が行ごとに 2.5pt ずれた表（高速パスの格子が崩れる）/
+    3: 縦罫線が右寄せの数値に食い込んだ表（罫線ベースの表検出でも数値が割れる）/ 4: 画像のみ
+    """
+    pytest.importorskip("pdfplumber")
+    pytest.importorskip("pypdfium2")
+    pytest.importorskip("reportlab")
+    from PIL import Image
+    from reportlab.lib.pagesizes import A3, landscape
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+    from reportlab.pdfgen import canvas
+
+    pdfmetrics.registerFont(UnicodeCIDFont("HeiseiKakuGo-W5"))
+    path = tmp_path_factory.mktemp("adaptive") / "第85期_順位.pdf"
+    c = canvas.Canvas(str(path), pagesize=landscape(A3))
+    _draw_table(c, _table(1))
+    _draw_table(c, _table(7), jitter=2.5)
+    _draw_table(c, _table(13), shift={6: -10.0})
+    c.drawImage(ImageReader(Image.new("L", (200, 100), 255)), 20, 500, 400, 200)
+    c.showPage()
+    c.save()
+    return path
+
+
+def _plumber_tables(path):
+    import pdfplumber
+
+    with pdfplumber.open(path) as pdf:
+        return [[[cell or "" for cell in row] for table in page.extract_tables() for row in table]
+                for page in pdf.pages]
+
+
+def test_fast_rows_match_pdfplumber_tables(ranking_pdf):
+    import pypdfium2 as pdfium
+
+    expected = _plumber_tables(ranking_pdf)
+    doc = pdfium.PdfDocument(str(ranking_pdf))
+    page = doc[0]
+    try:
+        rows, has_text, has_image = fast_page_rows(page)
+    finally:
+        page.close()
+        doc.close()
+    assert (has_text, has_image) == (True, False)
+    assert rows == expected[0] == _table(1)
+
+
+def test_pages_escalate_through_tiers(ranking_pdf):
+    with PageExtractor(ranking_pdf) as extractor:
+        results = [extractor.extract(i) for i in range(extractor.page_count)]
+
+    assert [tier for _, tier in results] == [TIER_FAST, TIER_TABLE, TIER_TEXT_TABLE, TIER_SCANNED]
+    assert results[1][0] == _plumber_tables(ranking_pdf)[1] == _table(7)
+    assert results[2][0][1:] == _table(13)[1:]
+    assert results[3][0] == []
+    assert all(score_rows(rows) == (1.0, 6) for rows, _ in results[:3])
+
+
+def test_confidence_none_always_uses_table_detection(ranking_pdf):
+    with PageExtractor(ranking_pdf, confidence=None) as extractor:
+        tiers = [extractor.extract(i)[1] for i in range(extractor.page_count)]
+    assert tiers == [TIER_TABLE, TIER_TABLE, TIER_TABLE, TIER_SCANNED]
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from ranking_manifest import (
+    LAYOUT_LEGACY, LAYOUT_RANK, LAYOUT_REP, Job, Manifest, discover_jobs, parse_filename,
+)
+
+
+@pytest.mark.parametrize("name, label, layout, months", [
+    ("第84期 2024.06-2025.05 お客様ランキング表.pdf", "第84期_順位", LAYOUT_RANK, 12),
+    ("第75期　2015.06-05　お客様ランキング表.pdf", "第75期_順位", LAYOUT_RANK, 12),
+    ("第82期 2022.06-12 ランキング表(担当別).pdf", "第82期_担当", LAYOUT_REP, 7),
+    ("第81期ランキング表(担当別).pdf", "第81期_担当", LAYOUT_REP, 12),
+    ("20051001～ 20060930　売上順位表（上位300社).pdf", "2005-2006", LAYOUT_LEGACY, 12),
+])
+def test_parse_filename(name, label, layout, months):
+    info = parse_filename(name)
+    assert (info["label"], info["layout"], info["months"]) == (label, layout, months)
+
+
+def test_parse_filename_unknown():
+    assert parse_filename("メモ.pdf") is None
+
+
+def _touch(folder, name, mtime):
+    path = folder / name
+    path.write_bytes(b"%PDF")
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_discover_jobs_prefers_full_year(tmp_path):
+    _touch(tmp_path, "第82期 2022.06-12 ランキング表(担当別).pdf", 2)
+    full = _touch(tmp_path, "第82期 2022.06-2023.05 担当別ランキング表.pdf", 1)
+    jobs = discover_jobs(tmp_path)
+    assert [(j.label, j.source) for j in jobs] == [("第82期_担当", full)]
+
+
+def test_discover_jobs_partial_only_when_requested(tmp_path):
+    partial = _touch(tmp_path, "第85期 2025.06-10 お客様ランキング表.pdf", 1)
+    assert discover_jobs(tmp_path) == []
+    assert [j.source for j in discover_jobs(tmp_path, include_partial=True)] == [partial]
+
+
+def test_discover_jobs_keeps_partial_listed_in_manifest(tmp_path, capsys):
+    listed = _touch(tmp_path, "第82期 2022.06-12 ランキング表(担当別).pdf", 1)
+    unlisted = _touch(tmp_path, "第85期 2025.06-10 お客様ランキング表.pdf", 1)
+    manifest = Manifest(source_dir=tmp_path, output_dir=tmp_path,
+                        jobs=[Job("第82期_担当", listed, None, LAYOUT_REP, "第82期", 7)])
+    jobs = discover_jobs(tmp_path, manifest)
+    assert [j.source for j in jobs] == [listed]
+    assert f"スキップ（--include-partial で対象）: {unlisted.name}" in capsys.readouterr().out
+
+
+def test_discover_jobs_reports_superseded_file(tmp_path, capsys):
+    partial = _touch(tmp_path, "第82期 2022.06-12 ランキング表(担当別).pdf", 2)
+    _touch(tmp_path, "第82期 2022.06-2023.05 担当別ランキング表.pdf", 1)
+    discover_jobs(tmp_path, include_partial=True)
+    assert f"スキップ: {partial.name}" in capsys.readouterr().out
@@ -0,0 +1,82 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+import ranking_ocr
+from ranking_ocr import OcrConfig, is_image_only, ocr_pages, page_hash, read_cache, write_cache
+
+
+class _Stream:
+    def __init__(self, data):
+        self.data = data
+
+    def get_rawdata(self):
+        return self.data
+
+
+def _page(data=b"scan", chars=(), images=None):
+    if images is None:
+        images = [{"x0": 10, "top": 20, "x1": 500, "bottom": 700, "stream": _Stream(data)}]
+    return SimpleNamespace(width=595.0, height=842.0, chars=list(chars), images=images)
+
+
+def test_is_image_only():
+    assert is_image_only(_page())
+    assert not is_image_only(_page(chars=[{"text": "1"}]))
+    assert not is_image_only(_page(images=[]))
+
+
+def test_page_hash_follows_content_and_config():
+    config = OcrConfig()
+    assert page_hash(_page(), config) == page_hash(_page(), config)
+    assert page_hash(_page(b"other"), config) != page_hash(_page(), config)
+    # 結果の変わる設定だけがキーに入る
+    assert page_hash(_page(), OcrConfig(dpi=200)) != page_hash(_page(), config)
+    assert page_hash(_page(), OcrConfig(psm=4)) != page_hash(_page(), config)
+    assert page_hash(_page(), OcrConfig(workers=8, cache_dir="x")) == page_hash(_page(), config)
+
+
+def test_cache_round_trip(tmp_path):
+    assert read_cache(tmp_path, "abc") is None
+    write_cache(tmp_path / "cache", "abc", "1 株式会社A 今期 100")
+    assert read_cache(tmp_path / "cache", "abc") == "1 株式会社A 今期 100"
+    assert read_cache(None, "abc") is None
+    write_cache(None, "abc", "unused")
+
+
+@pytest.fixture
+def fake_tesseract(monkeypatch):
+    calls = []
+
+    def ocr_page(pdf_path, index, config):
+        calls.append((index, config.dpi))
+        return f"page {index} dpi {config.dpi}"
+
+    monkeypatch.setattr(ranking_ocr, "available", lambda: True)
+    monkeypatch.setattr(ranking_ocr, "ocr_page", ocr_page)
+    monkeypatch.setattr(ranking_ocr, "ProcessPoolExecutor", ThreadPoolExecutor)
+    return calls
+
+
+def test_cache_hit_skips_tesseract(tmp_path, fake_tesseract):
+    config = OcrConfig(cache_dir=tmp_path)
+    pages = {0: page_hash(_page(b"p1"), config), 2: page_hash(_page(b"p3"), config)}
+
+    first = ocr_pages(tmp_path / "scan.pdf", pages, config)
+    assert sorted(fake_tesseract) == [(0, 300), (2, 300)]
+
+    fake_tesseract.clear()
+    assert ocr_pages(tmp_path / "scan.pdf", pages, config) == first
+    assert fake_tesseract == []
+
+
+def test_config_change_invalidates_cache(tmp_path, fake_tesseract):
+    config = OcrConfig(cache_dir=tmp_path)
+    ocr_pages(tmp_path / "scan.pdf", {0: page_hash(_page(), config)}, config)
+
+    fake_tesseract.clear()
+    changed = OcrConfig(dpi=200, cache_dir=tmp_path)
+    texts = ocr_pages(tmp_path / "scan.pdf", {0: page_hash(_page(), changed)}, changed)
+    assert fake_tesseract == [(0, 200)]
+    assert texts == {0: "page 0 dpi 200"}
@@ -0,0 +1,52 @@
+from ranking_parser_diff import COMPARE_FIELDS, count_duplicates, diff_outputs, normalize, summarize
+
+
+def _record(period_type="今期", **values):
+    record = {k: 0 for k in COMPARE_FIELDS}
+    record.update(rank="1", customer_name_raw="株式会社A", period_type=period_type, source_file="x.csv")
+    record.update(values)
+    return record
+
+
+def test_normalize_keeps_compare_fields_and_numeric_rank():
+    out = normalize([_record(rank="1,001"), _record("前期")])
+    assert set(out) == {"今期", "前期"}
+    assert out["今期"]["rank"] == 1001 and "source_file" not in out["今期"]
+
+
+def test_normalize_reports_duplicates_instead_of_overwriting():
+    out = normalize([_record(total=1), _record(total=2)])
+    assert out["今期"]["total"] == 1 and out["今期#2"]["total"] == 2
+    assert count_duplicates(out) == 1
+
+
+def test_diff_outputs_field_mismatch():
+    diffs = diff_outputs({"a": normalize([_record(month_06=5)]), "b": normalize([_record(month_06=6)])})
+    assert diffs == {"今期.month_06": {"a": 5, "b": 6}}
+
+
+def test_diff_outputs_missing_and_extra_period():
+    a = normalize([_record(), _record("前期")])
+    b = normalize([_record(), _record()])
+    assert diff_outputs({"a": a, "b": b}) == {
+        "今期#2.present": {"a": False, "b": True},
+        "前期.present": {"a": True, "b": False},
+    }
+
+
+def test_diff_outputs_agree():
+    assert diff_outputs({"a": normalize([_record()]), "b": normalize([_record()])}) == {}
+
+
+def test_summarize():
+    def result(source, entries, disagree, timings, duplicates=0):
+        return {"source": source, "entries": entries, "disagree": disagree,
+                "field_mismatch": {"total": disagree}, "timings_us": {"a": timings},
+                "errors": {"a": 0}, "duplicates": {"a": duplicates}, "examples": []}
+
+    summary = summarize([result("x.csv", 3, 1, [10, 20, 30]), result("y.csv", 1, 1, [40], 2)], ["a"])
+    assert summary["entries"] == 4 and summary["disagree"] == 2 and summary["disagree_rate"] == 0.5
+    assert summary["field_mismatch"] == {"total": 2}
+    assert summary["timing"]["a"]["mean_us"] == 25.0 and summary["timing"]["a"]["total_ms"] == 0.1
+    assert summary["timing"]["a"]["duplicates"] == 2
+    assert [f["disagree_rate"] for f in summary["per_file"]] == [0.3333, 1.0]
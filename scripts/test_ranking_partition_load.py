@@ -0,0 +1,93 @@
+import os
+import secrets
+
+import pytest
+
+from import_rankings_to_supabase import build_parse_manifest
+from ranking_partition_load import COPY_COLUMNS, RowCountMismatch, load_periods, swap_period
+
+PERIOD = "11111111-2222-3333-4444-555555555555"
+# ローカルの PostgreSQL で差し替えを確かめる場合に指定する（未指定ならスキップ）
+TEST_DSN = os.environ.get("RANKINGS_TEST_DSN")
+
+
+def _records(n, period=PERIOD):
+    return [{"fiscal_period_id": period, "rank": i + 1, "customer_name_raw": f"顧客{i}",
+             "period_type": "今期", "total": i, "source_file": "第85期_順位_import.csv"}
+            for i in range(n)]
+
+
+def test_load_requires_parse_manifest():
+    with pytest.raises(RowCountMismatch):
+        load_periods("postgresql://unused", _records(2), None)
+
+
+def test_load_rejects_period_missing_from_parse_manifest():
+    manifest = build_parse_manifest(_records(2, "00000000-0000-0000-0000-000000000000"))
+    with pytest.raises(RowCountMismatch):
+        load_periods("postgresql://unused", _records(2), manifest)
+
+
+@pytest.fixture
+def pg_schema():
+    psycopg = pytest.importorskip("psycopg")
+    if not TEST_DSN:
+        pytest.skip("RANKINGS_TEST_DSN が未指定")
+    schema = f"rankings_test_{secrets.token_hex(4)}"
+    conn = psycopg.connect(TEST_DSN)
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE SCHEMA {schema}")
+        cur.execute(f"""
+            CREATE TABLE {schema}.customer_sales_rankings (
+                id UUID NOT NULL DEFAULT gen_random_uuid(),
+                fiscal_period_id UUID NOT NULL,
+                rank INTEGER NOT NULL,
+                customer_name_raw TEXT NOT NULL,
+                sales_rep_name_raw TEXT, department_name_raw TEXT,
+                period_type TEXT NOT NULL,
+                month_06 NUMERIC DEFAULT 0, month_07 NUMERIC DEFAULT 0, month_08 NUMERIC DEFAULT 0,
+                month_09 NUMERIC DEFAULT 0, month_10 NUMERIC DEFAULT 0, month_11 NUMERIC DEFAULT 0,
+                month_12 NUMERIC DEFAULT 0, month_01 NUMERIC DEFAULT 0, month_02 NUMERIC DEFAULT 0,
+                month_03 NUMERIC DEFAULT 0, month_04 NUMERIC DEFAULT 0, month_05 NUMERIC DEFAULT 0,
+                total NUMERIC DEFAULT 0, source_file TEXT, doc_type TEXT,
+                PRIMARY KEY (id, fiscal_period_id)
+            ) PARTITION BY LIST (fiscal_period_id)""")
+        cur.execute(f"CREATE TABLE {schema}.customer_sales_rankings_default "
+                    f"PARTITION OF {schema}.customer_sales_rankings DEFAULT")
+    conn.commit()
+    yield conn, schema
+    conn.rollback()
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA {schema} CASCADE")
+    conn.commit()
+    conn.close()
+
+
+def _count(conn, schema):
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT count(*) FROM {schema}.customer_sales_rankings WHERE fiscal_period_id = %s",
+                    (PERIOD,))
+        return cur.fetchone()[0]
+
+
+def test_swap_period_replaces_rows_and_locks_partition(pg_schema):
+    conn, schema = pg_schema
+    assert set(COPY_COLUMNS) >= {"fiscal_period_id", "rank", "total"}
+    for n in (3, 5):
+        records = _records(n)
+        result = swap_period(conn, PERIOD, records, build_parse_manifest(records)["periods"][PERIOD],
+                             schema=schema)
+        assert _count(conn, schema) == n
+    with conn.cursor() as cur:
+        cur.execute("SELECT relrowsecurity FROM pg_class WHERE oid = %s::regclass",
+                    (f"{schema}.{result['partition']}",))
+        assert cur.fetchone()[0]
+
+
+def test_swap_period_count_mismatch_keeps_live_rows(pg_schema):
+    conn, schema = pg_schema
+    records = _records(3)
+    swap_period(conn, PERIOD, records, build_parse_manifest(records)["periods"][PERIOD], schema=schema)
+    with pytest.raises(RowCountMismatch):
+        swap_period(conn, PERIOD, _records(4), build_parse_manifest(records)["periods"][PERIOD], schema=schema)
+    assert _count(conn, schema) == 3
@@ -0,0 +1,23 @@
+import pytest
+
+from ranking_preview import MEMORY_BASIS_HEAP, MEMORY_BASIS_RSS, measure_memory, sample_indexes
+
+@pytest.mark.parametrize("page_count, samples, expected", [
+    (0, 3, []),
+    (1, 3, [0]),
+    (10, 3, [0, 4, 9]),
+    (2, 5, [0, 1]),
+])
+def test_sample_indexes(page_count, samples, expected):
+    assert sample_indexes(page_count, samples) == expected
+
+
+def test_measure_memory(tmp_path):
+    canvas = pytest.importorskip("reportlab.pdfgen.canvas")
+    path = tmp_path / "page.pdf"
+    pdf = canvas.Canvas(str(path))
+    pdf.drawString(72, 720, "1 株式会社A 100 100")
+    pdf.save()
+    memory = measure_memory(path, 0)
+    assert memory["basis"] in (MEMORY_BASIS_RSS, MEMORY_BASIS_HEAP)
+    assert all(memory[k] >= 0 for k in ("open", "per_page", "working"))
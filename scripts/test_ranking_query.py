@@ -0,0 +1,106 @@
+import sqlite3
+
+import pytest
+
+from generate_insert_sql import write_batches
+from ranking_pipeline import load
+from ranking_query import (
+    CUSTOMER_COLUMNS, PERIOD_COLUMNS, REFRESH_SQL, customer_history, refresh_sql, top_customers, top_for_period,
+)
+
+
+class SqliteConn:
+    """psycopg の代わり（%s を ? に置き換え、public スキーマに集計ビューと同じ列の表を作る）"""
+
+    def __init__(self):
+        self.db = sqlite3.connect(":memory:")
+        self.db.execute("ATTACH DATABASE ':memory:' AS public")
+        self.db.execute(f"CREATE TABLE public.mv_customer_sales_ranking_period ({', '.join(PERIOD_COLUMNS)})")
+        self.db.execute(f"CREATE TABLE public.mv_customer_sales_ranking_customer ({', '.join(CUSTOMER_COLUMNS)})")
+
+    def insert(self, view, columns, rows):
+        self.db.executemany(f"INSERT INTO public.{view} ({', '.join(columns)}) VALUES "
+                            f"({', '.join('?' for _ in columns)})", rows)
+
+    def cursor(self):
+        return _Cursor(self.db.cursor())
+
+
+class _Cursor:
+    def __init__(self, cur):
+        self.cur = cur
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cur.close()
+
+    def execute(self, query, params=()):
+        self.cur.execute(query.replace("%s", "?"), params)
+
+    @property
+    def description(self):
+        return self.cur.description
+
+    def fetchall(self):
+        return self.cur.fetchall()
+
+
+def _all_pages(fetch, limit):
+    rows, after = [], None
+    while True:
+        page = fetch(limit=limit, after=after)
+        rows += page["rows"]
+        if page["next"] is None:
+            return rows
+        after = page["next"]
+
+
+@pytest.fixture
+def conn():
+    conn = SqliteConn()
+    # 同順位（rank の同値）が続く期
+    conn.insert("mv_customer_sales_ranking_period",
+                ["fiscal_period_id", "period_no", "period_type", "rank", "customer_name_raw", "total"],
+                [("p85", 85, "今期", rank, name, 100) for rank, name in
+                 [(1, "A"), (2, "B"), (2, "C"), (2, "D"), (5, "E"), (5, "F"), (7, "G")]]
+                # 同じ顧客の推移（期番号のない旧形式の期が2つ）
+                + [(f"legacy{i}", None, "今期", 1, "A", 10) for i in range(2)]
+                + [(f"p{n}", n, "今期", 1, "A", 10) for n in (83, 84)])
+    # 累計が同じ顧客が続く
+    conn.insert("mv_customer_sales_ranking_customer", ["customer_name_raw", "lifetime_total"],
+                [("A", 500), ("B", 300), ("C", 300), ("D", 300), ("E", 100)])
+    return conn
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 10])
+def test_top_for_period_pages_through_ties(conn, limit):
+    rows = _all_pages(lambda **kw: top_for_period(conn, "p85", **kw), limit)
+    assert [r["customer_name_raw"] for r in rows] == list("ABCDEFG")
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 10])
+def test_top_customers_pages_through_ties(conn, limit):
+    rows = _all_pages(lambda **kw: top_customers(conn, **kw), limit)
+    assert [r["customer_name_raw"] for r in rows] == list("ABCDE")
+
+
+@pytest.mark.parametrize("limit", [1, 2, 10])
+def test_customer_history_pages_through_ties(conn, limit):
+    rows = _all_pages(lambda **kw: customer_history(conn, "A", **kw), limit)
+    assert [r["fiscal_period_id"] for r in rows] == ["legacy0", "legacy1", "p83", "p84", "p85"]
+
+
+def test_refresh_sql_only_for_rollup_source():
+    assert refresh_sql("public.customer_sales_rankings") == REFRESH_SQL
+    assert refresh_sql("customer_sales_ranking") == ""
+
+
+def test_sql_loads_refresh_rollups(tmp_path):
+    records = [{"fiscal_period_id": "p", "rank": 1, "customer_name_raw": "A", "source_file": "x_import.csv"}]
+    write_batches(records, tmp_path / "batches", "customer_sales_rankings")
+    assert (tmp_path / "batches" / "refresh.sql").read_text(encoding="utf-8") == REFRESH_SQL
+
+    sql = load(records, "x_import.csv", tmp_path, "customer_sales_rankings").read_text(encoding="utf-8")
+    assert sql.endswith("COMMIT;\n" + REFRESH_SQL)
@@ -0,0 +1,121 @@
+import asyncio
+import json
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from ranking_rest_loader import RestLoader  # noqa: E402
+
+
+class StubServer:
+    """
+    PostgREST の代わりに挿入された行を保持する（応答は responses の順に返す）。
+    resolution=ignore-duplicates なら、on_conflict の列が同じ行は登録しない。
+    """
+
+    def __init__(self, responses=()):
+        self.rows = []
+        self.responses = list(responses)
+        self.posts = 0
+        self.refreshed = False
+
+    def __call__(self, request):
+        if request.method == "DELETE":
+            source = request.url.params["source_file"].removeprefix("eq.")
+            self.rows = [r for r in self.rows if r["source_file"] != source]
+            return httpx.Response(204)
+        if "/rpc/" in request.url.path:
+            self.refreshed = True
+            return httpx.Response(204)
+        self.posts += 1
+        action = self.responses.pop(0) if self.responses else None
+        if isinstance(action, Exception):
+            raise action
+        if action == "commit-then-timeout":
+            # サーバー側では登録されたが、応答が届かない
+            self._insert(request)
+            raise httpx.ReadTimeout("timed out", request=request)
+        if isinstance(action, int) and action >= 300:
+            return httpx.Response(action)
+        self._insert(request)
+        return httpx.Response(201)
+
+    def _insert(self, request):
+        rows = json.loads(request.content)
+        if "resolution=ignore-duplicates" in request.headers.get("Prefer", ""):
+            columns = request.url.params["on_conflict"].split(",")
+            existing = {tuple(r.get(c) for c in columns) for r in self.rows}
+            rows = [r for r in rows if tuple(r.get(c) for c in columns) not in existing]
+        self.rows.extend(rows)
+
+
+def _records(n, source="第84期_順位_import.csv"):
+    return [{"fiscal_period_id": "p", "rank": i, "customer_name_raw": f"c{i}", "source_file": source}
+            for i in range(n)]
+
+
+def _load(server, records, table="customer_sales_rankings", concurrency=2, **kwargs):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(server)) as client:
+            loader = RestLoader("http://stub", "key", table, concurrency=concurrency, batch_size=10, min_batch=1,
+                                backoff=0, client=client)
+            return await loader.load(records, **kwargs)
+    return asyncio.run(run())
+
+
+def test_load_inserts_all_rows():
+    server = StubServer()
+    stats = _load(server, _records(95))
+    assert stats.rows == 95 and not stats.failed_rows
+    assert sorted(r["rank"] for r in server.rows) == list(range(95))
+
+
+def test_replace_deletes_existing_source_rows():
+    server = StubServer()
+    server.rows = _records(5)
+    _load(server, _records(3), replace=True)
+    assert len(server.rows) == 3
+
+
+def test_rejected_and_unsent_posts_are_retried():
+    request = httpx.Request("POST", "http://stub")
+    server = StubServer([429, httpx.ConnectError("refused", request=request)])
+    stats = _load(server, _records(10))
+    assert stats.rows == 10 and stats.retries == 2
+    assert len(server.rows) == 10
+
+
+def test_server_errors_are_retried_until_loaded():
+    server = StubServer([503, 503, 201])
+    stats = _load(server, _records(10))
+    assert stats.rows == 10 and stats.failed_rows == 0 and stats.retries == 2
+    assert sorted(r["rank"] for r in server.rows) == list(range(10))
+
+
+def test_retry_after_commit_does_not_duplicate():
+    # 登録済みのバッチを再送しても、同じ id の行は無視される
+    server = StubServer(["commit-then-timeout"])
+    stats = _load(server, _records(30))
+    assert stats.rows == 30 and stats.failed_rows == 0
+    assert sorted(r["rank"] for r in server.rows) == list(range(30))
+    assert len({r["id"] for r in server.rows}) == 30
+
+
+def test_exhausted_retries_fail_only_that_batch():
+    server = StubServer([503] * 7)
+    stats = _load(server, _records(30), concurrency=1)
+    assert stats.failed_rows == 10 and stats.rows == 20
+
+
+def test_refresh_after_load():
+    server = StubServer()
+    _load(server, _records(3), refresh=True)
+    assert server.refreshed
+
+
+def test_refresh_rejects_table_outside_rollups():
+    server = StubServer()
+    with pytest.raises(ValueError):
+        _load(server, _records(3), table="customer_sales_ranking", refresh=True)
+    assert server.posts == 0 and not server.rows
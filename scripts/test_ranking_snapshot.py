@@ -0,0 +1,101 @@
+from decimal import Decimal
+
+import pytest
+
+from import_rankings_to_supabase import group_entries, parse_entry
+from ranking_pipeline import MONTH_KEYS, validate
+from ranking_snapshot import diff_records, fiscal_month_keys, ledger_rows, reconcile_ledger
+
+
+def _record(name, total=None, rank=1, months=5, **values):
+    record = {"period_type": "今期", "customer_name_raw": name, "sales_rep_name_raw": "山田",
+              "department_name_raw": None, "rank": rank}
+    record.update({k: 0 for k in MONTH_KEYS})
+    record.update({k: 10 for k in fiscal_month_keys(months)})
+    record.update(values)
+    record["total"] = sum(record[k] for k in MONTH_KEYS) if total is None else total
+    return record
+
+
+def _ledger(records, months=5, previous=None):
+    return {"months": months, "rows": ledger_rows(records, previous)}
+
+
+def _updated(delta):
+    return {(r["customer_name_raw"], columns) for columns, rows in delta["updates"].items() for r in rows}
+
+
+def test_new_month_and_revision():
+    ledger = _ledger([_record("A"), _record("B")])
+    delta = diff_records([_record("A", months=6), _record("B", month_07=15), _record("C", months=6)], ledger)
+    assert [r["customer_name_raw"] for r in delta["inserts"]] == ["C"]
+    assert _updated(delta) == {("A", ("month_11", "total")), ("B", ("month_07", "total"))}
+    assert delta["new_months"] == ["month_11"] and delta["revised"] == {"month_07": 1}
+
+
+def test_total_only_change_is_updated():
+    ledger = _ledger([_record("A", total=100)])
+    delta = diff_records([_record("A", total=150)], ledger)
+    assert _updated(delta) == {("A", ("total",))} and delta["unchanged"] == 0
+    assert diff_records([_record("A", total=100)], ledger)["unchanged"] == 1
+
+
+def test_missing_row_stays_in_ledger_and_reappears_as_update():
+    # s1{A,B} → s2{A} → s3{A,B}: B は DB に残っているので、s3 で INSERT してはいけない
+    s1 = [_record("A"), _record("B")]
+    ledger = _ledger(s1)
+    s2 = [_record("A", months=6)]
+    delta = diff_records(s2, ledger)
+    assert delta["missing"] == 1
+    ledger = _ledger(s2, months=6, previous=ledger["rows"])
+    assert ledger["rows"][next(k for k in ledger["rows"] if "\tB\t" in k)]["stale"]
+
+    s3 = [_record("A", months=7), _record("B", months=7)]
+    delta = diff_records(s3, ledger)
+    assert delta["inserts"] == []
+    assert ("B", ("month_11", "month_12", "total")) in _updated(delta)
+    assert not any(row.get("stale") for row in _ledger(s3, 7, ledger["rows"])["rows"].values())
+
+
+def test_reconcile_uses_stored_rows():
+    ledger = _ledger([_record("A"), _record("B")])
+    stored = [{**_record("A", total=999), "total": Decimal("999"), "month_06": Decimal("10")}]
+    baseline = reconcile_ledger(ledger, stored)
+    assert not baseline["duplicates"] and baseline["months"] == 5
+    # DB の値が基準になる: B は DB にないので INSERT、A は合計の違いで UPDATE
+    delta = diff_records([_record("A"), _record("B")], baseline)
+    assert [r["customer_name_raw"] for r in delta["inserts"]] == ["B"]
+    assert _updated(delta) == {("A", ("total",))}
+
+
+def test_reconcile_flags_duplicate_rows():
+    assert reconcile_ledger(_ledger([]), [_record("A"), _record("A")])["duplicates"]
+
+
+def _import_row(current, previous):
+    """import用CSVの1行（今期・前期を改行で重ねたセル。空欄の月は今期側が空）"""
+    cells = [f"{a:,}\n{b:,}" if a is not None else f"\n{b:,}" for a, b in zip(current, previous)]
+    return ["period-uuid", "1", "株式会社テスト", "山田", "営業1", "今期\n前期"] + cells
+
+
+def test_seven_month_row_maps_total_outside_month_columns():
+    current = [100, 200, 300, 400, 500, 600, 700] + [None] * 5 + [2800]
+    previous = list(range(1, 13)) + [78]
+    entry = next(group_entries([_import_row(current, previous)]))
+
+    records = {r["period_type"]: r for r in parse_entry(entry, "第85期_順位_import.csv", 7)}
+
+    now = records["今期"]
+    assert [now[k] for k in fiscal_month_keys(7)] == current[:7]
+    assert all(now[k] == 0 for k in MONTH_KEYS if k not in fiscal_month_keys(7))
+    assert now["total"] == 2800
+    assert [records["前期"][k] for k in MONTH_KEYS] == previous[:12]
+    errors, warnings = validate(list(records.values()))
+    assert not errors and warnings["total_mismatch"] == 0
+
+
+def test_seven_month_row_rejects_values_outside_covered_months():
+    current = [100] * 8 + [None] * 4 + [800]
+    entry = next(group_entries([_import_row(current, [0] * 13)]))
+    with pytest.raises(ValueError, match="対象外の月"):
+        parse_entry(entry, "第85期_順位_import.csv", 7)
@@ -0,0 +1,72 @@
+from ranking_manifest import Manifest, fingerprint, job_for_path, load_state, save_state, update_state
+from ranking_watch import Debouncer, IngestDaemon
+
+
+def _manifest(tmp_path):
+    source = tmp_path / "in"
+    source.mkdir()
+    return Manifest(source_dir=source, output_dir=tmp_path / "out")
+
+
+def test_update_state_keeps_concurrent_updates(tmp_path):
+    path = tmp_path / ".ranking_state.json"
+    update_state(path, {"a": {"sha256": "1"}})
+    update_state(path, {"b": {"sha256": "2"}})
+    assert load_state(path) == {"a": {"sha256": "1"}, "b": {"sha256": "2"}}
+
+
+def test_daemon_ignores_extract_state(tmp_path):
+    manifest = _manifest(tmp_path)
+    pdf = manifest.source_dir / "第84期 2024.06-2025.05 お客様ランキング表.pdf"
+    pdf.write_bytes(b"%PDF")
+    job = job_for_path(pdf, manifest)
+    manifest.output_dir.mkdir()
+    (manifest.output_dir / f"{job.label}.csv").write_text("")
+
+    # rankings.py extract 済み（抽出だけ）でも、監視デーモンはロードまで行う
+    save_state(manifest.state_path, {job.label: fingerprint(job)})
+    daemon = IngestDaemon(manifest, manifest.source_dir)
+    daemon.enqueue(pdf)
+    assert [j.label for j, _ in daemon.queue] == [job.label]
+
+    # デーモン自身がロードまで済ませたものは再投入しない
+    daemon.queue.clear()
+    save_state(manifest.ingest_state_path, {job.label: fingerprint(job)})
+    daemon.enqueue(pdf)
+    assert not daemon.queue
+
+
+def test_debouncer_merges_events_until_quiet(tmp_path):
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(b"%PDF")
+    debouncer = Debouncer(settle=5)
+    for now in (0, 1, 2):
+        debouncer.touch(pdf, now)
+        assert debouncer.ready(now) == []
+    assert len(debouncer.pending) == 1
+
+    # 書き込みが続くと待ち時間はやり直し
+    pdf.write_bytes(b"%PDF-1.7")
+    assert debouncer.ready(4) == []
+    assert debouncer.ready(8) == []
+    assert debouncer.ready(9) == [pdf]
+    assert debouncer.ready(20) == []
+
+
+def test_full_queue_defers_and_merges_work(tmp_path):
+    manifest = _manifest(tmp_path)
+    first = manifest.source_dir / "第83期 2023.06-2024.05 お客様ランキング表.pdf"
+    second = manifest.source_dir / "第84期 2024.06-2025.05 お客様ランキング表.pdf"
+    for pdf in (first, second):
+        pdf.write_bytes(b"%PDF")
+    daemon = IngestDaemon(manifest, manifest.source_dir, queue_size=1)
+
+    daemon.enqueue(first)
+    daemon.enqueue(first)  # 同じジョブは重ねない
+    assert [j.source for j, _ in daemon.queue] == [first]
+
+    # 満杯なら捨てずに待ち行列の外（デバウンス待ち）へ戻す
+    daemon.enqueue(second)
+    assert [j.source for j, _ in daemon.queue] == [first]
+    assert second in daemon.debouncer.pending
+    assert first in daemon.debouncer.pending
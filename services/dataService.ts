@@ -5729,7 +5729,7 @@ export const getCustomerSalesRankings = async (): Promise<any[]> => {
     const supabase = getSupabase();
     console.log('[dataService] getCustomerSalesRankings: fetching rankings');
     const { data, error } = await supabase
-        .from('customer_sales_ranking')
+        .from('customer_sales_rankings')
         .select('*')
         .order('rank', { ascending: true });
     
@@ -5737,6 +5737,71 @@ export const getCustomerSalesRankings = async (): Promise<any[]> => {
     return data || [];
 };
 
+// ============================================================
+// 顧客売上ランキング（集計ビュー + キーセットページング）
+// mv_customer_sales_ranking_* は取り込み処理で更新される
+// ============================================================
+
+const CUSTOMER_SALES_RANKING_COLUMNS = 'fiscal_period_id, period_no, period_type, rank, customer_name_raw, sales_rep_name_raw, total';
+
+export interface CustomerSalesRankingCursor {
+    rank: number;
+    customerName: string;
+}
+
+export interface CustomerSalesRankingPage {
+    rows: any[];
+    next: CustomerSalesRankingCursor | null;
+}
+
+// PostgREST の or() フィルタ内で値をそのまま使えるようにクォートする
+const quotePostgrestValue = (value: string): string =>
+    `"${value.replace(/\\/g, '\\\\').replace(/"/g, '\\"')}"`;
+
+export const getCustomerSalesRankingPage = async (
+    fiscalPeriodId: string,
+    options?: { periodType?: string; limit?: number; after?: CustomerSalesRankingCursor | null }
+): Promise<CustomerSalesRankingPage> => {
+    const supabase = getSupabase();
+    const limit = options?.limit ?? 50;
+    const periodType = options?.periodType ?? '今期';
+    const after = options?.after;
+
+    let query = supabase
+        .from('mv_customer_sales_ranking_period')
+        .select(CUSTOMER_SALES_RANKING_COLUMNS)
+        .eq('fiscal_period_id', fiscalPeriodId)
+        .eq('period_type', periodType);
+    if (after) {
+        const name = quotePostgrestValue(after.customerName);
+        query = query.or(`rank.gt.${after.rank},and(rank.eq.${after.rank},customer_name_raw.gt.${name})`);
+    }
+    const { data, error } = await query
+        .order('rank', { ascending: true })
+        .order('customer_name_raw', { ascending: true })
+        .limit(limit + 1);
+    ensureSupabaseSuccess(error, 'Failed to fetch customer sales ranking page');
+
+    const rows = (data || []).slice(0, limit);
+    const last = rows[rows.length - 1];
+    return {
+        rows,
+        next: (data || []).length > limit && last ? { rank: last.rank, customerName: last.customer_name_raw } : null,
+    };
+};
+
+export const getCustomerSalesHistory = async (customerName: string, periodType = '今期'): Promise<any[]> => {
+    const supabase = getSupabase();
+    const { data, error } = await supabase
+        .from('mv_customer_sales_ranking_period')
+        .select(CUSTOMER_SALES_RANKING_COLUMNS)
+        .eq('customer_name_raw', customerName)
+        .eq('period_type', periodType)
+        .order('period_no', { ascending: true });
+    ensureSupabaseSuccess(error, 'Failed to fetch customer sales history');
+    return data || [];
+};
+
 export const getMachines = async (): Promise<Machine[]> => {
     const supabase = getSupabase();
     console.log('[dataService] getMachines: fetching machines');
@@ -0,0 +1,134 @@
+-- ============================================================
+-- 2026-03-20 customer_sales_rankings を fiscal_period_id でパーティション化
+-- 期ごとにステージングテーブルへ一括ロード → パーティション差し替えで
+-- 再取り込みできるようにする（scripts/ranking_partition_load.py）
+-- ============================================================
+
+BEGIN;
+
+-- ========================================
+-- 1. 既存テーブルを退避
+-- ========================================
+DROP VIEW IF EXISTS public.v_customer_sales_rankings;
+ALTER TABLE public.customer_sales_rankings RENAME TO customer_sales_rankings_unpartitioned;
+
+-- ========================================
+-- 2. パーティション親テーブル
+--    主キーにはパーティションキーを含める必要がある
+-- ========================================
+CREATE TABLE public.customer_sales_rankings (
+    id UUID NOT NULL DEFAULT gen_random_uuid(),
+    fiscal_period_id UUID NOT NULL,
+    rank INTEGER NOT NULL,
+    customer_name_raw TEXT NOT NULL,
+    sales_rep_name_raw TEXT,
+    department_name_raw TEXT,
+    period_type TEXT NOT NULL, -- '今期' or '前期'
+    month_06 NUMERIC DEFAULT 0,
+    month_07 NUMERIC DEFAULT 0,
+    month_08 NUMERIC DEFAULT 0,
+    month_09 NUMERIC DEFAULT 0,
+    month_10 NUMERIC DEFAULT 0,
+    month_11 NUMERIC DEFAULT 0,
+    month_12 NUMERIC DEFAULT 0,
+    month_01 NUMERIC DEFAULT 0,
+    month_02 NUMERIC DEFAULT 0,
+    month_03 NUMERIC DEFAULT 0,
+    month_04 NUMERIC DEFAULT 0,
+    month_05 NUMERIC DEFAULT 0,
+    total NUMERIC DEFAULT 0,
+    source_file TEXT,
+    doc_type TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()),
+    PRIMARY KEY (id, fiscal_period_id)
+) PARTITION BY LIST (fiscal_period_id);
+
+-- 未知の期を受け止める DEFAULT パーティション
+CREATE TABLE public.customer_sales_rankings_default
+    PARTITION OF public.customer_sales_rankings DEFAULT;
+
+-- 既存の期ごとにパーティションを作成
+DO $$
+DECLARE
+    pid UUID;
+BEGIN
+    FOR pid IN SELECT DISTINCT fiscal_period_id FROM public.customer_sales_rankings_unpartitioned LOOP
+        EXECUTE format(
+            'CREATE TABLE public.%I PARTITION OF public.customer_sales_rankings FOR VALUES IN (%L)',
+            'customer_sales_rankings_p_' || replace(pid::text, '-', ''),
+            pid
+        );
+    END LOOP;
+END $$;
+
+INSERT INTO public.customer_sales_rankings
+SELECT * FROM public.customer_sales_rankings_unpartitioned;
+
+DROP TABLE public.customer_sales_rankings_unpartitioned;
+
+-- ========================================
+-- 3. インデックス（パーティションごとに自動作成される）
+-- ========================================
+CREATE INDEX IF NOT EXISTS idx_customer_sales_rankings_fiscal_period ON public.customer_sales_rankings(fiscal_period_id);
+CREATE INDEX IF NOT EXISTS idx_customer_sales_rankings_period_type ON public.customer_sales_rankings(period_type);
+CREATE INDEX IF NOT EXISTS idx_customer_sales_rankings_customer_name ON public.customer_sales_rankings(customer_name_raw);
+CREATE INDEX IF NOT EXISTS idx_customer_sales_rankings_rank ON public.customer_sales_rankings(rank);
+
+-- ========================================
+-- 4. RLS・ポリシー（親テーブル経由のアクセスに適用）
+-- ========================================
+ALTER TABLE public.customer_sales_rankings ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Enable read access for all users" ON public.customer_sales_rankings FOR SELECT USING (true);
+CREATE POLICY "Enable insert for authenticated users only" ON public.customer_sales_rankings FOR INSERT WITH CHECK (auth.role() = 'authenticated');
+CREATE POLICY "Enable update for authenticated users only" ON public.customer_sales_rankings FOR UPDATE USING (auth.role() = 'authenticated');
+CREATE POLICY "Enable delete for authenticated users only" ON public.customer_sales_rankings FOR DELETE USING (auth.role() = 'authenticated');
+
+-- パーティション（DEFAULT と期ごと）は public の通常のテーブルとして PostgREST から
+-- 直接アクセスでき、親テーブルのポリシーは効かない。RLS を有効にし（ポリシーなし = 拒否）、
+-- 公開ロールの権限も外す。親テーブル経由のアクセスには親の RLS が適用される。
+-- 取り込み時に ATTACH するパーティションは ranking_partition_load.py が同じ設定にする
+DO $$
+DECLARE
+    part regclass;
+BEGIN
+    FOR part IN SELECT inhrelid::regclass FROM pg_inherits
+                WHERE inhparent = 'public.customer_sales_rankings'::regclass LOOP
+        EXECUTE format('ALTER TABLE %s ENABLE ROW LEVEL SECURITY', part);
+        EXECUTE format('REVOKE ALL ON %s FROM anon, authenticated', part);
+    END LOOP;
+END $$;
+
+-- ========================================
+-- 5. ビュー再作成
+-- ========================================
+CREATE OR REPLACE VIEW public.v_customer_sales_rankings AS
+SELECT
+    id,
+    fiscal_period_id,
+    rank,
+    customer_name_raw,
+    sales_rep_name_raw,
+    department_name_raw,
+    period_type,
+    month_06,
+    month_07,
+    month_08,
+    month_09,
+    month_10,
+    month_11,
+    month_12,
+    month_01,
+    month_02,
+    month_03,
+    month_04,
+    month_05,
+    total,
+    source_file,
+    created_at,
+    updated_at
+FROM public.customer_sales_rankings
+ORDER BY fiscal_period_id, period_type, rank;
+
+COMMIT;
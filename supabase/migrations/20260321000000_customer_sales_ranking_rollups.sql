@@ -0,0 +1,103 @@
+-- ============================================================
+-- 2026-03-21 顧客売上ランキングの集計（マテリアライズドビュー）
+-- ダッシュボードの主な問い合わせ
+--   「期Xの上位50社」 → mv_customer_sales_ranking_period を (期, 区分, 順位) のキーセットで取得
+--   「顧客Yの推移」   → mv_customer_sales_ranking_period を (顧客名, 区分, 期番号) で取得
+--   「顧客別の累計」   → mv_customer_sales_ranking_customer
+-- ロード後に refresh_customer_sales_ranking_rollups() で更新する
+-- ============================================================
+
+-- ========================================
+-- 1. 元テーブルの複合インデックス（パーティションにも自動作成される）
+-- ========================================
+CREATE INDEX IF NOT EXISTS idx_customer_sales_rankings_period_rank
+    ON public.customer_sales_rankings(fiscal_period_id, period_type, rank);
+CREATE INDEX IF NOT EXISTS idx_customer_sales_rankings_customer_period
+    ON public.customer_sales_rankings(customer_name_raw, fiscal_period_id);
+
+-- ========================================
+-- 2. 期別ランキング（1期・1区分・1顧客 = 1行）
+--    同じ期に順位別・担当別の両方がある場合は順位別を優先する
+-- ========================================
+DROP MATERIALIZED VIEW IF EXISTS public.mv_customer_sales_ranking_customer;
+DROP MATERIALIZED VIEW IF EXISTS public.mv_customer_sales_ranking_period;
+
+CREATE MATERIALIZED VIEW public.mv_customer_sales_ranking_period AS
+SELECT DISTINCT ON (fiscal_period_id, period_type, customer_name_raw)
+    fiscal_period_id,
+    substring(source_file FROM '第(\d+)期')::int AS period_no,
+    period_type,
+    rank,
+    customer_name_raw,
+    sales_rep_name_raw,
+    department_name_raw,
+    month_06,
+    month_07,
+    month_08,
+    month_09,
+    month_10,
+    month_11,
+    month_12,
+    month_01,
+    month_02,
+    month_03,
+    month_04,
+    month_05,
+    total
+FROM public.customer_sales_rankings
+ORDER BY fiscal_period_id, period_type, customer_name_raw,
+         (source_file LIKE '%担当%'), rank, total DESC;
+
+-- REFRESH ... CONCURRENTLY に必要な一意インデックス
+CREATE UNIQUE INDEX idx_mv_csr_period_key
+    ON public.mv_customer_sales_ranking_period(fiscal_period_id, period_type, customer_name_raw);
+-- 期別上位N社（キーセット: rank, customer_name_raw）
+CREATE INDEX idx_mv_csr_period_rank
+    ON public.mv_customer_sales_ranking_period(fiscal_period_id, period_type, rank, customer_name_raw);
+-- 顧客別推移
+CREATE INDEX idx_mv_csr_period_customer
+    ON public.mv_customer_sales_ranking_period(customer_name_raw, period_type, period_no);
+
+-- ========================================
+-- 3. 顧客別累計（今期の値のみ集計）
+-- ========================================
+CREATE MATERIALIZED VIEW public.mv_customer_sales_ranking_customer AS
+SELECT
+    customer_name_raw,
+    count(*)                                          AS period_count,
+    sum(total)                                        AS lifetime_total,
+    min(rank)                                         AS best_rank,
+    min(period_no)                                    AS first_period_no,
+    max(period_no)                                    AS latest_period_no,
+    (array_agg(total ORDER BY period_no DESC NULLS LAST))[1] AS latest_total,
+    (array_agg(rank ORDER BY period_no DESC NULLS LAST))[1]  AS latest_rank
+FROM public.mv_customer_sales_ranking_period
+WHERE period_type = '今期'
+GROUP BY customer_name_raw;
+
+CREATE UNIQUE INDEX idx_mv_csr_customer_key
+    ON public.mv_customer_sales_ranking_customer(customer_name_raw);
+-- 累計上位（キーセット: lifetime_total DESC, customer_name_raw）
+CREATE INDEX idx_mv_csr_customer_total
+    ON public.mv_customer_sales_ranking_customer(lifetime_total DESC, customer_name_raw);
+
+GRANT SELECT ON public.mv_customer_sales_ranking_period TO anon, authenticated;
+GRANT SELECT ON public.mv_customer_sales_ranking_customer TO anon, authenticated;
+
+-- ========================================
+-- 4. 更新関数（ロード処理から呼び出す）
+-- ========================================
+CREATE OR REPLACE FUNCTION public.refresh_customer_sales_ranking_rollups()
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    REFRESH MATERIALIZED VIEW CONCURRENTLY public.mv_customer_sales_ranking_period;
+    REFRESH MATERIALIZED VIEW CONCURRENTLY public.mv_customer_sales_ranking_customer;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.refresh_customer_sales_ranking_rollups() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.refresh_customer_sales_ranking_rollups() TO service_role;
@@ -0,0 +1,31 @@
+-- ============================================================
+-- 2026-03-22 期中スナップショット（途中月のランキング表）の取り込み履歴
+-- scripts/ranking_snapshot.py が取り込みごとに1行追加する。
+-- 同じ期・source_file の通期版を取り込むと、それまでの行に superseded_at が入る
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS public.customer_sales_ranking_snapshots (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    fiscal_period_id UUID NOT NULL,
+    source_file TEXT NOT NULL,       -- customer_sales_rankings.source_file
+    snapshot_file TEXT NOT NULL,     -- 元のPDFファイル名
+    sha256 TEXT NOT NULL,
+    previous_sha256 TEXT,            -- 直前に取り込んだスナップショット
+    months INTEGER NOT NULL,         -- 期首からの対象月数（12 = 通期版）
+    mode TEXT NOT NULL,              -- 'delta' / 'replace' / 'final'
+    new_months TEXT[] NOT NULL DEFAULT '{}',
+    revised_cells INTEGER NOT NULL DEFAULT 0,
+    inserted INTEGER NOT NULL DEFAULT 0,
+    updated INTEGER NOT NULL DEFAULT 0,
+    superseded_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_customer_sales_ranking_snapshots_period
+    ON public.customer_sales_ranking_snapshots(fiscal_period_id, source_file, created_at);
+
+ALTER TABLE public.customer_sales_ranking_snapshots ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Enable read access for all users" ON public.customer_sales_ranking_snapshots FOR SELECT USING (true);
+CREATE POLICY "Enable insert for authenticated users only" ON public.customer_sales_ranking_snapshots FOR INSERT WITH CHECK (auth.role() = 'authenticated');
+CREATE POLICY "Enable update for authenticated users only" ON public.customer_sales_ranking_snapshots FOR UPDATE USING (auth.role() = 'authenticated');
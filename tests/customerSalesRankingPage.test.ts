@@ -0,0 +1,96 @@
+import { beforeEach, describe, expect, it, vi } from 'vitest';
+import { getCustomerSalesRankingPage } from '../services/dataService';
+
+let supabaseStub: any;
+
+vi.mock('../services/supabaseClient', () => ({
+  getSupabase: () => supabaseStub,
+  getSupabaseFunctionHeaders: vi.fn(),
+}));
+
+type Row = { fiscal_period_id: string; period_type: string; rank: number; customer_name_raw: string };
+
+// getCustomerSalesRankingPage が組み立てるキーセット条件だけを解釈する
+const CURSOR_FILTER = /^rank\.gt\.(\d+),and\(rank\.eq\.(\d+),customer_name_raw\.gt\."((?:[^"\\]|\\.)*)"\)$/;
+
+const parseCursorFilter = (expr: string) => {
+  const match = CURSOR_FILTER.exec(expr);
+  if (!match) throw new Error(`unexpected filter: ${expr}`);
+  const rank = Number(match[1]);
+  const name = match[3].replace(/\\(.)/g, '$1');
+  return (row: Row) => row.rank > rank || (row.rank === Number(match[2]) && row.customer_name_raw > name);
+};
+
+const compare = (a: Row, b: Row, orders: Array<[keyof Row, boolean]>) => {
+  for (const [column, ascending] of orders) {
+    if (a[column] === b[column]) continue;
+    return (a[column] < b[column] ? -1 : 1) * (ascending ? 1 : -1);
+  }
+  return 0;
+};
+
+const makeSupabase = (rows: Row[]) => ({
+  from: vi.fn(() => {
+    const filters: Array<(row: Row) => boolean> = [];
+    const orders: Array<[keyof Row, boolean]> = [];
+    const builder: any = {
+      select: () => builder,
+      eq: (column: keyof Row, value: unknown) => {
+        filters.push(row => row[column] === value);
+        return builder;
+      },
+      or: (expr: string) => {
+        filters.push(parseCursorFilter(expr));
+        return builder;
+      },
+      order: (column: keyof Row, options: { ascending: boolean }) => {
+        orders.push([column, options.ascending]);
+        return builder;
+      },
+      limit: (n: number) =>
+        Promise.resolve({
+          data: rows
+            .filter(row => filters.every(f => f(row)))
+            .sort((a, b) => compare(a, b, orders))
+            .slice(0, n),
+          error: null,
+        }),
+    };
+    return builder;
+  }),
+});
+
+describe('getCustomerSalesRankingPage', () => {
+  // 同順位が続き、得意先名に引用符・カンマを含む
+  const names: Array<[number, string]> = [
+    [1, 'A'], [2, 'B'], [2, 'C "社"'], [2, 'D, Inc.'], [5, 'E'], [5, 'F'], [7, 'G'],
+  ];
+  const rows: Row[] = names.map(([rank, name]) => ({
+    fiscal_period_id: 'p85',
+    period_type: '今期',
+    rank,
+    customer_name_raw: name,
+  }));
+
+  beforeEach(() => {
+    supabaseStub = makeSupabase([...rows, { ...rows[0], fiscal_period_id: 'p84' }]);
+  });
+
+  it.each([1, 2, 3, 10])('pages through rank ties without skipping or repeating (limit %i)', async limit => {
+    const seen: string[] = [];
+    let after = null;
+    for (let i = 0; i < rows.length + 1; i += 1) {
+      const page = await getCustomerSalesRankingPage('p85', { limit, after });
+      seen.push(...page.rows.map((row: Row) => row.customer_name_raw));
+      if (!page.next) break;
+      after = page.next;
+    }
+    expect(seen).toEqual(names.map(([, name]) => name));
+  });
+
+  it('returns no cursor on the last page', async () => {
+    const page = await getCustomerSalesRankingPage('p85', { limit: rows.length });
+    expect(page.rows).toHaveLength(rows.length);
+    expect(page.next).toBeNull();
+  });
+});